@@ -0,0 +1,155 @@
+from evennia.server.models import ServerConfig
+from evennia.utils.evtable import EvTable
+
+from commands.command import COMMAND_STATS, HISTOGRAM_BOUNDS, MuxCommand
+from commands.merging import MERGE_CACHE_STATS
+from world.datamigration import MIGRATIONS, RUNNING, DataMigration
+
+
+class CmdCmdStats(MuxCommand):
+    """
+    show command timing statistics
+
+    Usage:
+      cmdstats [<number>]
+      cmdstats/reset
+
+    Shows the slowest commands by mean run time and the most frequently
+    used commands since the server started, <number> of each (default
+    10). Times are in milliseconds, and 'parse' is the time spent before
+    the command itself runs. The /reset switch clears the statistics.
+    """
+
+    key = "cmdstats"
+    switch_options = ("reset",)
+    locks = "cmd:perm(Developer)"
+    help_category = "System"
+
+    def func(self):
+        """Define command"""
+
+        caller = self.caller
+        if "reset" in self.switches:
+            COMMAND_STATS.clear()
+            MERGE_CACHE_STATS["hits"] = MERGE_CACHE_STATS["misses"] = 0
+            caller.msg("Command statistics cleared.")
+            return
+
+        if self.args and not self.args.strip().isdigit():
+            caller.msg("Usage: cmdstats [<number>]")
+            return
+        number = int(self.args.strip()) if self.args else 10
+
+        if not COMMAND_STATS:
+            caller.msg("No commands have been timed yet.")
+            return
+
+        slowest = sorted(COMMAND_STATS.items(), key=lambda item: item[1].mean, reverse=True)
+        frequent = sorted(COMMAND_STATS.items(), key=lambda item: item[1].count, reverse=True)
+
+        caller.msg("|wSlowest commands|n\n{0}".format(self.format_table(slowest[:number])))
+        caller.msg("|wMost frequent commands|n\n{0}".format(self.format_table(frequent[:number])))
+
+        merges = MERGE_CACHE_STATS["hits"] + MERGE_CACHE_STATS["misses"]
+        if merges:
+            caller.msg("Cmdset merge cache: {0} hits, {1} misses ({2:.1f}% hit rate).".format(
+                MERGE_CACHE_STATS["hits"],
+                MERGE_CACHE_STATS["misses"],
+                100.0 * MERGE_CACHE_STATS["hits"] / merges,
+            ))
+
+    def format_table(self, entries):
+        """
+        Format command stats as a table.
+
+        Args:
+            entries (list): (key, CommandStats) tuples.
+
+        Returns:
+            table (EvTable): The table.
+
+        """
+        table = EvTable(
+            "command", "count", "mean", "max", "parse", "func", "queries", "slowest bucket",
+            border="header")
+        for key, stats in entries:
+            # the highest histogram bucket with any runs in it
+            top = max(index for index, count in enumerate(stats.histogram) if count)
+            bucket = ("<={0}".format(HISTOGRAM_BOUNDS[top]) if top < len(HISTOGRAM_BOUNDS)
+                      else ">{0}".format(HISTOGRAM_BOUNDS[-1]))
+            table.add_row(
+                key,
+                stats.count,
+                "{0:.2f}".format(stats.mean),
+                "{0:.2f}".format(stats.max),
+                "{0:.2f}".format(stats.parse_total / stats.count),
+                "{0:.2f}".format(stats.func_total / stats.count),
+                "{0:.1f}".format(stats.queries / stats.count),
+                bucket,
+            )
+        return table
+
+
+class CmdMigrate(MuxCommand):
+    """
+    convert stored object data to a new layout
+
+    Usage:
+      migrate
+      migrate <name>
+      migrate/stop <name>
+
+    Without arguments, lists the available migrations, whether they are
+    running, where they would resume and how many objects failed to
+    convert. With a name, starts that migration, continuing from its
+    checkpoint if it was stopped before, and first trying again the
+    objects that failed. Objects are converted in chunks in the
+    background, and you are told when the migration ends. The /stop
+    switch stops a running migration after its current chunk.
+    """
+
+    key = "migrate"
+    switch_options = ("stop",)
+    locks = "cmd:perm(Developer)"
+    help_category = "System"
+
+    def func(self):
+        """Define command"""
+
+        caller = self.caller
+        name = self.args.strip()
+        if not name:
+            table = EvTable("name", "status", "converts", border="header")
+            for key, (_, _, description) in sorted(MIGRATIONS.items()):
+                migration = RUNNING.get(key)
+                if migration:
+                    status = "running, {0} done".format(migration.converted)
+                else:
+                    checkpoint = ServerConfig.objects.conf("migration_{0}".format(key))
+                    status = "stopped after #{0}".format(checkpoint) if checkpoint else "-"
+                    failed = ServerConfig.objects.conf("migration_{0}_failed".format(key))
+                    if failed:
+                        status += ", {0} failed".format(len(failed))
+                table.add_row(key, status, description)
+            caller.msg(str(table))
+            return
+
+        if name not in MIGRATIONS:
+            caller.msg("There is no migration '{0}'.".format(name))
+            return
+
+        migration = RUNNING.get(name)
+        if "stop" in self.switches:
+            if not migration:
+                caller.msg("Migration '{0}' is not running.".format(name))
+                return
+            migration.stop()
+            caller.msg("Migration '{0}' will stop after its current chunk.".format(name))
+            return
+
+        if migration:
+            caller.msg("Migration '{0}' is already running.".format(name))
+            return
+        migration = DataMigration(name, caller=caller)
+        migration.start()
+        caller.msg("Migration '{0}' started after #{1}.".format(name, migration.last_id))
@@ -1,7 +1,18 @@
+from django.conf import settings
+
 from evennia import default_cmds
 
+from commands.command import CommandTimingMixin, MuxCommand
+from typeclasses.exits import DoorState
+from world import prototype_cache
+from world.access import check_access
+from world.bulkspawn import bulk_spawn
+from world.doors import find_doors, set_door_states
+
+_BULK_SPAWN_MAX_COUNT = settings.BULK_SPAWN_MAX_COUNT
 
-class CmdDesc(default_cmds.MuxCommand):
+
+class CmdDesc(MuxCommand):
     """
     describe an object or the current room.
 
@@ -53,11 +64,130 @@ class CmdDesc(default_cmds.MuxCommand):
                 return
             desc = self.rhs or ""
 
-            if obj.access(self.caller, "control") or obj.access(self.caller, "edit"):
+            if check_access(self.caller, obj, ("control", "edit")):
                 obj.db.desc = desc
+                obj.at_desc_change()
                 caller.msg("The description was set on {0}.".format(
                     obj.get_display_name(caller)))
                 caller.msg("New description: \n{0}".format(desc))
             else:
                 caller.msg(
                     "You don't have permission to edit the description of {0}.".format(obj.key))
+
+
+class CmdDoors(MuxCommand):
+    """
+    open, close or lock many doors at once.
+
+    Usage:
+      doors/open <tag>[:<category>]
+      doors/close <tag>[:<category>]
+      doors/lock <tag>[:<category>]
+
+    Changes the state of every door with the given tag, such as all
+    doors of a zone ("doors/close crypt:zone"). Both sides of a door
+    change together. No messages are shown in the rooms.
+    """
+
+    key = "doors"
+    switch_options = ("open", "close", "lock")
+    locks = "cmd:perm(doors) or perm(Builder)"
+    help_category = "Building"
+
+    states = {
+        "open": (DoorState.open, "Opened"),
+        "close": (DoorState.closed, "Closed"),
+        "lock": (DoorState.locked, "Locked"),
+    }
+
+    def func(self):
+        """Define command"""
+
+        caller = self.caller
+        if not self.args or len(self.switches) != 1:
+            caller.msg("Usage: doors/open|close|lock <tag>[:<category>]")
+            return
+
+        tag, _, category = self.args.partition(":")
+        tag, category = tag.strip(), category.strip() or None
+        state, verb = self.states[self.switches[0]]
+
+        doors = find_doors(tag, category=category)
+        if not doors:
+            caller.msg("No doors are tagged {0}.".format(self.args))
+            return
+
+        changed = set_door_states(doors, state)
+        caller.msg("{0} {1} door(s) tagged {2}.".format(verb, changed, self.args))
+
+
+class CmdBulkSpawn(MuxCommand):
+    """
+    spawn many objects from a prototype
+
+    Usage:
+      bulkspawn <prototype key> = <number>
+
+    Creates <number> objects from the prototype in your location, all in
+    one go. This is much faster than spawning them one by one, such as
+    when repopulating an area. At most settings.BULK_SPAWN_MAX_COUNT
+    objects can be created at once.
+    """
+
+    key = "bulkspawn"
+    locks = "cmd:perm(spawn) or perm(Builder)"
+    help_category = "Building"
+
+    def func(self):
+        """Define command"""
+
+        caller = self.caller
+        if not self.lhs or not self.rhs or not self.rhs.strip().isdigit():
+            caller.msg("Usage: bulkspawn <prototype key> = <number>")
+            return
+
+        key = self.lhs.strip()
+        count = int(self.rhs.strip())
+        if not 0 < count <= _BULK_SPAWN_MAX_COUNT:
+            caller.msg("You can spawn 1 to {0} objects at once.".format(_BULK_SPAWN_MAX_COUNT))
+            return
+        try:
+            objs = bulk_spawn(key, count, location=caller.location)
+        except KeyError:
+            caller.msg("There is no prototype '{0}'.".format(key))
+            return
+        except RuntimeError as err:
+            caller.msg("Could not spawn {0}: {1}".format(key, err))
+            return
+        caller.msg("Spawned {0} object(s) from {1}.".format(len(objs), key))
+
+
+class CmdSpawn(CommandTimingMixin, default_cmds.CmdSpawn):
+    __doc__ = default_cmds.CmdSpawn.__doc__
+
+    def func(self):
+        """Define command"""
+
+        caller = self.caller
+        key = self.args.strip()
+        if set(self.switches) - {"noloc"} or not key or key.startswith("{"):
+            return super().func()
+
+        # spawning by key, from the prototype cache
+        prototype = prototype_cache.get(key)
+        if prototype is None:
+            # partial keys and unknown prototypes are reported by the default
+            return super().func()
+        if not caller.locks.check_lockstring(
+                caller, prototype.get("prototype_locks", ""), access_type="spawn", default=True):
+            caller.msg("You don't have access to use this prototype.")
+            return
+
+        noloc = "noloc" in self.switches
+        try:
+            for obj in prototype_cache.spawn(prototype):
+                caller.msg("Spawned {0}.".format(obj.get_display_name(caller)))
+                if not noloc and not prototype.get("location"):
+                    obj.location = caller.location
+        except RuntimeError as err:
+            caller.msg(err)
@@ -1,7 +1,215 @@
+"""
+Commands
+
+Commands describe the input the account can do to the game.
+
+The base command classes in this module time every command they run.
+For each command key they keep a count, the time spent in parse() and
+func(), the number of database queries issued, and a histogram of total
+run times. Commands slower than `settings.COMMAND_SLOW_LOG_THRESHOLD`
+milliseconds are logged. The collected stats are shown by the
+`cmdstats` command.
+
+A command whose func() yields is timed when its generator is exhausted,
+counting only the time spent running it, not the time waited between
+its yields.
+
+"""
+import time
+import types
+
+from django.conf import settings
+from django.db import connection
+
 from evennia.commands.command import Command as BaseCommand
+from evennia.commands.default.muxcommand import MuxCommand as BaseMuxCommand
+from evennia.utils import logger
+
+_SLOW_LOG_THRESHOLD = settings.COMMAND_SLOW_LOG_THRESHOLD
+
+# upper bounds of the histogram buckets, in milliseconds. The last
+# bucket counts everything slower than the last bound.
+HISTOGRAM_BOUNDS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+# stats are kept under this key for all exit traversal commands, rather
+# than one entry per exit name
+EXIT_COMMAND_KEY = "<exit>"
+
+# CommandStats by command key
+COMMAND_STATS = {}
 
 
-class Command(BaseCommand):
+class CommandStats:
+    """
+    Run time statistics for one command key.
+
+    """
+
+    __slots__ = ("count", "total", "parse_total", "func_total", "queries", "max", "histogram")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.parse_total = 0.0
+        self.func_total = 0.0
+        self.queries = 0
+        self.max = 0.0
+        self.histogram = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+
+    def add(self, parse_time, func_time, queries):
+        """
+        Record one run of the command.
+
+        Args:
+            parse_time (float): Milliseconds spent in parse().
+            func_time (float): Milliseconds spent in func().
+            queries (int): Database queries issued.
+
+        """
+        total = parse_time + func_time
+        self.count += 1
+        self.total += total
+        self.parse_total += parse_time
+        self.func_total += func_time
+        self.queries += queries
+        self.max = max(self.max, total)
+        for index, bound in enumerate(HISTOGRAM_BOUNDS):
+            if total <= bound:
+                self.histogram[index] += 1
+                break
+        else:
+            self.histogram[-1] += 1
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+
+class CommandRun:
+    """
+    The timing of one run of a command. For the run, it replaces the
+    command's parse() and func() with its own, which call the ones of
+    the command's class, so time spent in parent classes through
+    `super()` is counted once and in the right part. It also counts
+    the database queries issued meanwhile.
+
+    """
+
+    __slots__ = ("cmd", "parse_time", "queries")
+
+    def __init__(self, cmd):
+        """
+        Args:
+            cmd (Command): The command being run.
+
+        """
+        self.cmd = cmd
+        self.parse_time = 0.0
+        self.queries = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # database execute wrapper
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    def parse(self):
+        start = time.perf_counter()
+        with connection.execute_wrapper(self):
+            type(self.cmd).parse(self.cmd)
+        self.parse_time = (time.perf_counter() - start) * 1000
+
+    def func(self):
+        start = time.perf_counter()
+        with connection.execute_wrapper(self):
+            result = type(self.cmd).func(self.cmd)
+        func_time = (time.perf_counter() - start) * 1000
+        if isinstance(result, types.GeneratorType):
+            return self.timed_generator(result, func_time)
+        self.cmd.record_run(self.parse_time, func_time, self.queries)
+        return result
+
+    def timed_generator(self, generator, func_time):
+        """
+        Run the generator returned by a func() that yields, adding the time
+        spent in each of its steps to `func_time`. The run is recorded
+        when the generator is exhausted or closed.
+
+        """
+        try:
+            value = None
+            while True:
+                start = time.perf_counter()
+                try:
+                    with connection.execute_wrapper(self):
+                        value = generator.send(value)
+                except StopIteration:
+                    return
+                finally:
+                    func_time += (time.perf_counter() - start) * 1000
+                value = yield value
+        finally:
+            generator.close()
+            self.cmd.record_run(self.parse_time, func_time, self.queries)
+
+
+class CommandTimingMixin:
+    """
+    Mixin for Command classes that records how long each run takes.
+
+    """
+
+    def get_stats_key(self):
+        """
+        Get the key the stats of this command are recorded under.
+
+        Returns:
+            key (str): The stats key.
+
+        """
+        return EXIT_COMMAND_KEY if getattr(self, "is_exit", False) else self.key
+
+    def at_pre_cmd(self):
+        run = CommandRun(self)
+        self.parse = run.parse
+        self.func = run.func
+        return super().at_pre_cmd()
+
+    def at_post_cmd(self):
+        super().at_post_cmd()
+        self.__dict__.pop("parse", None)
+        self.__dict__.pop("func", None)
+
+    def record_run(self, parse_time, func_time, queries):
+        """
+        Add one run of this command to its stats, and log it if slow.
+
+        Args:
+            parse_time (float): Milliseconds spent in parse().
+            func_time (float): Milliseconds spent in func().
+            queries (int): Database queries issued.
+
+        """
+        key = self.get_stats_key()
+        stats = COMMAND_STATS.get(key)
+        if stats is None:
+            stats = COMMAND_STATS[key] = CommandStats()
+        stats.add(parse_time, func_time, queries)
+
+        if parse_time + func_time >= _SLOW_LOG_THRESHOLD:
+            logger.log_warn(
+                "Slow command '{0}' by {1}: {2:.1f}ms (parse {3:.1f}ms, func {4:.1f}ms, "
+                "{5} queries)".format(
+                    self.raw_string.strip() if self.raw_string else key,
+                    self.caller,
+                    parse_time + func_time,
+                    parse_time,
+                    func_time,
+                    queries,
+                )
+            )
+
+
+class Command(CommandTimingMixin, BaseCommand):
     """
     Inherit from this if you want to create your own command styles
     from scratch.  Note that Evennia's default commands inherits from
@@ -31,149 +239,28 @@ class Command(BaseCommand):
 #
 #   evennia.commands.default.muxcommand.MuxCommand.
 #
-# If you want to make sweeping changes to default commands you can
-# uncomment this copy of the MuxCommand parent and add
+# The MuxCommand below adds the timing of this module on top of it.
+# It is used as the parent of the default commands through
 #
 #   COMMAND_DEFAULT_CLASS = "commands.command.MuxCommand"
 #
-# to your settings file. Be warned that the default commands expect
-# the functionality implemented in the parse() method, so be
-# careful with what you change.
+# in the settings file, and the game's own commands inherit from it
+# directly.
 #
 # -------------------------------------------------------------
 
-# from evennia.utils import utils
-#
-#
-# class MuxCommand(Command):
-#     """
-#     This sets up the basis for a MUX command. The idea
-#     is that most other Mux-related commands should just
-#     inherit from this and don't have to implement much
-#     parsing of their own unless they do something particularly
-#     advanced.
-#
-#     Note that the class's __doc__ string (this text) is
-#     used by Evennia to create the automatic help entry for
-#     the command, so make sure to document consistently here.
-#     """
-#     def has_perm(self, srcobj):
-#         """
-#         This is called by the cmdhandler to determine
-#         if srcobj is allowed to execute this command.
-#         We just show it here for completeness - we
-#         are satisfied using the default check in Command.
-#         """
-#         return super().has_perm(srcobj)
-#
-#     def at_pre_cmd(self):
-#         """
-#         This hook is called before self.parse() on all commands
-#         """
-#         pass
-#
-#     def at_post_cmd(self):
-#         """
-#         This hook is called after the command has finished executing
-#         (after self.func()).
-#         """
-#         pass
-#
-#     def parse(self):
-#         """
-#         This method is called by the cmdhandler once the command name
-#         has been identified. It creates a new set of member variables
-#         that can be later accessed from self.func() (see below)
-#
-#         The following variables are available for our use when entering this
-#         method (from the command definition, and assigned on the fly by the
-#         cmdhandler):
-#            self.key - the name of this command ('look')
-#            self.aliases - the aliases of this cmd ('l')
-#            self.permissions - permission string for this command
-#            self.help_category - overall category of command
-#
-#            self.caller - the object calling this command
-#            self.cmdstring - the actual command name used to call this
-#                             (this allows you to know which alias was used,
-#                              for example)
-#            self.args - the raw input; everything following self.cmdstring.
-#            self.cmdset - the cmdset from which this command was picked. Not
-#                          often used (useful for commands like 'help' or to
-#                          list all available commands etc)
-#            self.obj - the object on which this command was defined. It is often
-#                          the same as self.caller.
-#
-#         A MUX command has the following possible syntax:
-#
-#           name[ with several words][/switch[/switch..]] arg1[,arg2,...] [[=|,] arg[,..]]
-#
-#         The 'name[ with several words]' part is already dealt with by the
-#         cmdhandler at this point, and stored in self.cmdname (we don't use
-#         it here). The rest of the command is stored in self.args, which can
-#         start with the switch indicator /.
-#
-#         This parser breaks self.args into its constituents and stores them in the
-#         following variables:
-#           self.switches = [list of /switches (without the /)]
-#           self.raw = This is the raw argument input, including switches
-#           self.args = This is re-defined to be everything *except* the switches
-#           self.lhs = Everything to the left of = (lhs:'left-hand side'). If
-#                      no = is found, this is identical to self.args.
-#           self.rhs: Everything to the right of = (rhs:'right-hand side').
-#                     If no '=' is found, this is None.
-#           self.lhslist - [self.lhs split into a list by comma]
-#           self.rhslist - [list of self.rhs split into a list by comma]
-#           self.arglist = [list of space-separated args (stripped, including '=' if it exists)]
-#
-#           All args and list members are stripped of excess whitespace around the
-#           strings, but case is preserved.
-#         """
-#         raw = self.args
-#         args = raw.strip()
-#
-#         # split out switches
-#         switches = []
-#         if args and len(args) > 1 and args[0] == "/":
-#             # we have a switch, or a set of switches. These end with a space.
-#             switches = args[1:].split(None, 1)
-#             if len(switches) > 1:
-#                 switches, args = switches
-#                 switches = switches.split('/')
-#             else:
-#                 args = ""
-#                 switches = switches[0].split('/')
-#         arglist = [arg.strip() for arg in args.split()]
-#
-#         # check for arg1, arg2, ... = argA, argB, ... constructs
-#         lhs, rhs = args, None
-#         lhslist, rhslist = [arg.strip() for arg in args.split(',')], []
-#         if args and '=' in args:
-#             lhs, rhs = [arg.strip() for arg in args.split('=', 1)]
-#             lhslist = [arg.strip() for arg in lhs.split(',')]
-#             rhslist = [arg.strip() for arg in rhs.split(',')]
-#
-#         # save to object properties:
-#         self.raw = raw
-#         self.switches = switches
-#         self.args = args.strip()
-#         self.arglist = arglist
-#         self.lhs = lhs
-#         self.lhslist = lhslist
-#         self.rhs = rhs
-#         self.rhslist = rhslist
-#
-#         # if the class has the account_caller property set on itself, we make
-#         # sure that self.caller is always the account if possible. We also create
-#         # a special property "character" for the puppeted object, if any. This
-#         # is convenient for commands defined on the Account only.
-#         if hasattr(self, "account_caller") and self.account_caller:
-#             if utils.inherits_from(self.caller, "evennia.objects.objects.DefaultObject"):
-#                 # caller is an Object/Character
-#                 self.character = self.caller
-#                 self.caller = self.caller.account
-#             elif utils.inherits_from(self.caller, "evennia.accounts.accounts.DefaultAccount"):
-#                 # caller was already an Account
-#                 self.character = self.caller.get_puppet(self.session)
-#             else:
-#                 self.character = None
+
+class MuxCommand(CommandTimingMixin, BaseMuxCommand):
+    """
+    This sets up the basis for a MUX command. The idea
+    is that most other Mux-related commands should just
+    inherit from this and don't have to implement much
+    parsing of their own unless they do something particularly
+    advanced.
+
+    Note that the class's __doc__ string (this text) is
+    used by Evennia to create the automatic help entry for
+    the command, so make sure to document consistently here.
+    """
+
+    pass
@@ -12,16 +12,21 @@ This module wraps the default command sets of Evennia; overloads them
 to add/remove commands from the default lineup. You can create your
 own cmdsets by inheriting from them or directly from `evennia.CmdSet`.
 
+The cmdsets here are merged through the cache in `commands/merging.py`,
+so a character's cmdset stack is not merged again for every command.
+
 """
 
 from evennia import default_cmds
 from commands import (
+    admin,
     general,
     building
 )
+from commands.merging import MemoizedMergeMixin
 
 
-class CharacterCmdSet(default_cmds.CharacterCmdSet):
+class CharacterCmdSet(MemoizedMergeMixin, default_cmds.CharacterCmdSet):
     """
     The `CharacterCmdSet` contains general in-game commands like `look`,
     `get`, etc available on in-game Character objects. It is merged with
@@ -54,9 +59,12 @@ class CharacterCmdSet(default_cmds.CharacterCmdSet):
 
         # building
         self.add(building.CmdDesc())
+        self.add(building.CmdDoors())
+        self.add(building.CmdBulkSpawn())
+        self.add(building.CmdSpawn())
 
 
-class AccountCmdSet(default_cmds.AccountCmdSet):
+class AccountCmdSet(MemoizedMergeMixin, default_cmds.AccountCmdSet):
     """
     This is the cmdset available to the Account at all times. It is
     combined with the `CharacterCmdSet` when the Account puppets a
@@ -75,8 +83,12 @@ class AccountCmdSet(default_cmds.AccountCmdSet):
         # any commands you add below will overload the default ones.
         #
 
+        # admin
+        self.add(admin.CmdCmdStats())
+        self.add(admin.CmdMigrate())
+
 
-class UnloggedinCmdSet(default_cmds.UnloggedinCmdSet):
+class UnloggedinCmdSet(MemoizedMergeMixin, default_cmds.UnloggedinCmdSet):
     """
     Command set available to the Session before being logged in.  This
     holds commands like creating a new account, logging in, etc.
@@ -94,7 +106,7 @@ class UnloggedinCmdSet(default_cmds.UnloggedinCmdSet):
         #
 
 
-class SessionCmdSet(default_cmds.SessionCmdSet):
+class SessionCmdSet(MemoizedMergeMixin, default_cmds.SessionCmdSet):
     """
     This cmdset is made available on Session level once logged in. It
     is empty by default.
@@ -1,10 +1,10 @@
-from evennia import default_cmds
+from commands.command import MuxCommand
 from typeclasses.characters import Hand, PhysicalPosition
 from typeclasses.objects import CustomObject, WearableObject
 from typeclasses.characters import Character
 
 
-class CmdEcho(default_cmds.MuxCommand):
+class CmdEcho(MuxCommand):
     """
     Simple command example
 
@@ -22,7 +22,7 @@ class CmdEcho(default_cmds.MuxCommand):
             self.caller.msg("You gave the string {0}".format(self.args))
 
 
-class CmdEquipment(default_cmds.MuxCommand):
+class CmdEquipment(MuxCommand):
     """
     Show all worn equipment for a character. 
     """
@@ -32,10 +32,13 @@ class CmdEquipment(default_cmds.MuxCommand):
     def func(self):
         caller: Character = self.caller
         caller.msg("|wYou are wearing the following equipment:|n")
-        caller.msg(caller.get_equipment_display())
+        caller.msg(
+            caller.get_equipment_display(),
+            equipment=((), {"slots": caller.get_equipment_data()})
+        )
 
 
-class CmdOpen(default_cmds.MuxCommand):
+class CmdOpen(MuxCommand):
     """
     Attempts to open an object.
 
@@ -51,7 +54,7 @@ class CmdOpen(default_cmds.MuxCommand):
             opener.msg("Open what?")
             return
 
-        target: CustomObject = opener.search(self.arglist[0])
+        target: CustomObject = opener.search(self.arglist[0], fuzzy=True)
         if not target:
             return
 
@@ -63,7 +66,7 @@ class CmdOpen(default_cmds.MuxCommand):
         return
 
 
-class CmdClose(default_cmds.MuxCommand):
+class CmdClose(MuxCommand):
     """
     Attempts to close an object.
 
@@ -79,7 +82,7 @@ class CmdClose(default_cmds.MuxCommand):
             closer.msg("Close what?")
             return
 
-        target: CustomObject = closer.search(self.arglist[0])
+        target: CustomObject = closer.search(self.arglist[0], fuzzy=True)
         if not target:
             return
 
@@ -89,7 +92,7 @@ class CmdClose(default_cmds.MuxCommand):
             target.at_failed_close(closer)
 
 
-class CmdStand(default_cmds.MuxCommand):
+class CmdStand(MuxCommand):
     """
     Attempts to stand up.
 
@@ -107,7 +110,7 @@ class CmdStand(default_cmds.MuxCommand):
             caller.at_failed_change_position(PhysicalPosition.standing)
 
 
-class CmdKneel(default_cmds.MuxCommand):
+class CmdKneel(MuxCommand):
     """
     Attempts to kneel.
 
@@ -125,7 +128,7 @@ class CmdKneel(default_cmds.MuxCommand):
             caller.at_failed_change_position(PhysicalPosition.kneeling)
 
 
-class CmdSit(default_cmds.MuxCommand):
+class CmdSit(MuxCommand):
     """
     Attempts to sit.
 
@@ -143,7 +146,7 @@ class CmdSit(default_cmds.MuxCommand):
             caller.at_failed_change_position(PhysicalPosition.sitting)
 
 
-class CmdLie(default_cmds.MuxCommand):
+class CmdLie(MuxCommand):
     """
     Attempts to lie down.
 
@@ -161,7 +164,7 @@ class CmdLie(default_cmds.MuxCommand):
             caller.at_failed_change_position(PhysicalPosition.lying)
 
 
-class CmdWear(default_cmds.MuxCommand):
+class CmdWear(MuxCommand):
     """
     Wear an object.
 
@@ -177,7 +180,7 @@ class CmdWear(default_cmds.MuxCommand):
             caller.msg("Wear what?")
             return
 
-        target = caller.search(self.arglist[0])
+        target = caller.search(self.arglist[0], fuzzy=True)
         if not target:
             return
 
@@ -185,24 +188,25 @@ class CmdWear(default_cmds.MuxCommand):
             caller.msg("You can't wear that.")
             return
 
-        if target not in caller.db.inventory.values():
+        if not caller.equipment.is_holding(target):
             caller.msg("You have to be holding something to wear it.")
             return
 
         wearable_location = target.db.wearable_location
-        if caller.db.equipment[wearable_location] is target:
+        worn_item = caller.equipment.get_worn(wearable_location)
+        if worn_item is target:
             caller.msg("You're already wearing that.")
-        elif caller.db.equipment[wearable_location] is not None:
+        elif worn_item is not None:
             caller.msg("You're already wearing something else there.")
         else:
-            caller.db.equipment[wearable_location] = target
+            caller.equipment.set_worn(wearable_location, target)
             held_in_hand = caller.get_containing_hand(target)
-            caller.db.inventory[held_in_hand] = None
-            target.db.is_worn = True
+            caller.equipment.set_held(held_in_hand, None)
+            target.writebehind.add("is_worn", True)
             caller.msg("You wear {0}.".format(target.name))
 
 
-class CmdRemove(default_cmds.MuxCommand):
+class CmdRemove(MuxCommand):
     """
     Remove an object.
 
@@ -219,7 +223,7 @@ class CmdRemove(default_cmds.MuxCommand):
             caller.msg("Remove what?")
             return
 
-        target = caller.search(self.arglist[0])
+        target = caller.search(self.arglist[0], fuzzy=True)
         if not target:
             return
 
@@ -233,18 +237,18 @@ class CmdRemove(default_cmds.MuxCommand):
 
         wearable_location = target.db.wearable_location
         free_hand = caller.get_free_hand()
-        if caller.db.equipment[wearable_location] is not target:
+        if caller.equipment.get_worn(wearable_location) is not target:
             caller.msg("You aren't wearing that.")
         elif free_hand is None:
             caller.msg("You don't have a free hand to hold it in.")
         else:
-            caller.db.equipment[wearable_location] = None
-            caller.db.inventory[free_hand] = target
-            target.db.is_worn = False
+            caller.equipment.set_worn(wearable_location, None)
+            caller.equipment.set_held(free_hand, target)
+            target.writebehind.add("is_worn", False)
             caller.msg("You remove {0}.".format(target.name))
 
 
-class CmdInventory(default_cmds.MuxCommand):
+class CmdInventory(MuxCommand):
     """
     view inventory
 
@@ -262,8 +266,8 @@ class CmdInventory(default_cmds.MuxCommand):
 
     def func(self):
         """check inventory"""
-        left_hand_item = self.caller.db.inventory[Hand.left]
-        right_hand_item = self.caller.db.inventory[Hand.right]
+        left_hand_item = self.caller.equipment.get_held(Hand.left)
+        right_hand_item = self.caller.equipment.get_held(Hand.right)
 
         if not left_hand_item and not right_hand_item:
             self.caller.msg("You aren't carrying anything.")
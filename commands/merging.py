@@ -0,0 +1,212 @@
+"""
+Cmdset merge cache
+
+Evennia merges the full cmdset stack (session, account, character, the
+room's exits, channels, ...) every time a command is entered. The stack
+of a character rarely changes between two commands, so this module
+memoizes merge results.
+
+Cmdsets inheriting from `MemoizedMergeMixin` are merged through the
+cache. A cmdset is identified in the cache by:
+
+- its class, merge options and the object it is stored on, if it is a
+  plain instance of a cmdset class such as `CharacterCmdSet`. A new
+  instance of the same cmdset on the same object, as made when the
+  object's cmdsets are loaded again, then finds the same entries.
+- its identity, if it is any other cmdset or a plain instance that has
+  been changed after creation (with `add` or `remove`).
+- the operands it was made from, if it is itself a cached merge result.
+
+Merge results are never shared between objects, so their commands have
+the right `obj` and `merged_from` only holds the cmdsets of one caller.
+
+Entries only hold weak references to the cmdsets and objects whose ids
+are in their signatures, and are dropped as soon as one of those is
+garbage collected, so no id in a signature can be reused while cached.
+Since merge results refer to the objects their cmdsets are stored on,
+Objects and Accounts also drop the entries that refer to them when they
+are deleted or leave the idmapper cache, with `forget_merges`.
+
+Hits and misses are counted in `MERGE_CACHE_STATS`.
+
+"""
+import weakref
+from collections import OrderedDict
+
+from evennia import CmdSet
+
+_MERGE_CACHE_SIZE = 2048
+
+# (ids of the objects in the signatures, merge result) by operand
+# signatures
+_MERGE_CACHE = OrderedDict()
+# keys of the cache entries whose signatures hold an object's id, by id
+_REFERENT_KEYS = {}
+# finalizers dropping the entries of an object when it is collected, by
+# the object's id
+_FINALIZERS = {}
+
+MERGE_CACHE_STATS = {"hits": 0, "misses": 0}
+
+
+def _merge_options(cmdset):
+    return (
+        cmdset.key,
+        cmdset.mergetype,
+        cmdset.priority,
+        cmdset.duplicates,
+        cmdset.no_exits,
+        cmdset.no_objs,
+        cmdset.no_channels,
+        tuple(sorted(cmdset.key_mergetypes.items())),
+    )
+
+
+def merge_signature(cmdset):
+    """
+    Get the cache signature of a cmdset.
+
+    Args:
+        cmdset (CmdSet): The cmdset.
+
+    Returns:
+        signature (tuple): The signature.
+        referents (tuple): Weak references to the objects whose ids the
+            signature holds.
+
+    """
+    merge_key = getattr(cmdset, "merge_key", None)
+    changed = getattr(cmdset, "merge_version", 0)
+    if merge_key is not None and not changed:
+        return merge_key, cmdset.merge_referents
+    if getattr(cmdset, "shared_merge", False) and not changed:
+        cmdsetobj = cmdset.cmdsetobj
+        return ((type(cmdset), id(cmdsetobj)) + _merge_options(cmdset),
+                (weakref.ref(cmdsetobj),) if cmdsetobj is not None else ())
+    return (id(cmdset),) + _merge_options(cmdset), (weakref.ref(cmdset),)
+
+
+def _drop(key):
+    entry = _MERGE_CACHE.pop(key, None)
+    if entry is not None:
+        for referent_id in entry[0]:
+            keys = _REFERENT_KEYS.get(referent_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del _REFERENT_KEYS[referent_id]
+
+
+def _forget(referent_id, collected=False):
+    for key in list(_REFERENT_KEYS.get(referent_id, ())):
+        _drop(key)
+    if collected:
+        _FINALIZERS.pop(referent_id, None)
+
+
+def _store(key, referents, result):
+    """
+    Cache a merge result, unless one of the objects in its signature is
+    already gone.
+
+    """
+    referent_ids = []
+    for ref in referents:
+        referent = ref()
+        if referent is None:
+            return
+        referent_id = id(referent)
+        if referent_id not in _FINALIZERS:
+            _FINALIZERS[referent_id] = weakref.finalize(referent, _forget, referent_id, True)
+        referent_ids.append(referent_id)
+
+    _MERGE_CACHE[key] = (referent_ids, result)
+    for referent_id in referent_ids:
+        _REFERENT_KEYS.setdefault(referent_id, set()).add(key)
+    if len(_MERGE_CACHE) > _MERGE_CACHE_SIZE:
+        _drop(next(iter(_MERGE_CACHE)))
+
+
+class MemoizedMergeMixin:
+    """
+    Mixin for CmdSets whose merges should be cached.
+
+    """
+
+    # plain instances of this class on the same object are
+    # interchangeable in merges
+    shared_merge = True
+    # set on merge results, see `merge_signature`
+    merge_key = None
+    merge_referents = ()
+    # bumped when commands are added or removed after creation
+    merge_version = 0
+    _merge_ready = False
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._merge_ready = True
+
+    def add(self, *args, **kwargs):
+        if self._merge_ready:
+            self.merge_version += 1
+        return super().add(*args, **kwargs)
+
+    def remove(self, *args, **kwargs):
+        if self._merge_ready:
+            self.merge_version += 1
+        return super().remove(*args, **kwargs)
+
+    def __add__(self, cmdset_a):
+        signature, referents = merge_signature(self)
+        signature_a, referents_a = merge_signature(cmdset_a)
+        key = (signature, signature_a)
+
+        entry = _MERGE_CACHE.get(key)
+        if entry is not None:
+            MERGE_CACHE_STATS["hits"] += 1
+            _MERGE_CACHE.move_to_end(key)
+            return entry[1]
+
+        MERGE_CACHE_STATS["misses"] += 1
+        result = super().__add__(cmdset_a)
+        if result is self or result is cmdset_a:
+            # merging with an empty cmdset returns the other one as is
+            return result
+        result.__class__ = MergedCmdSet
+        result.merge_key = key
+        result.merge_referents = referents + referents_a
+        result._merge_ready = True
+        _store(key, result.merge_referents, result)
+        return result
+
+
+class MergedCmdSet(MemoizedMergeMixin, CmdSet):
+    """
+    The class of cached merge results, so that merging further onto them
+    is cached too.
+
+    """
+
+    shared_merge = False
+
+
+def clear_merge_cache():
+    """
+    Forget all cached merge results.
+
+    """
+    _MERGE_CACHE.clear()
+    _REFERENT_KEYS.clear()
+
+
+def forget_merges(obj):
+    """
+    Forget the cached merge results whose signatures hold an object, such
+    as one being deleted or dropped from the idmapper cache.
+
+    Args:
+        obj (any): The object.
+
+    """
+    _forget(id(obj))
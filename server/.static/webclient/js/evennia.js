@@ -17,6 +17,14 @@ All messages are valid JSON arrays on this single form:
 where args is an JSON array and kwargs is a JSON object. These will be both
 used as arguments emitted to a callback named "cmdname" as cmdname(args, kwargs).
 
+Over websockets, the client asks the server for msgpack framing right
+after connecting, with a "client_framing" message. If the server agrees,
+messages in both directions are then sent as msgpack-encoded binary
+frames of the same form. Servers that don't know about it never answer,
+and the client keeps sending JSON. Binary frames are always decoded as
+msgpack and text frames as JSON, so messages sent while switching over
+are read correctly.
+
 This library makes the "Evennia" object available. It has the
 following official functions:
 
@@ -211,6 +219,223 @@ An "emitter" object must have a function
         return {emit:emit, on:on, off:off};
     };
 
+    // Minimal msgpack codec, used for the binary framing of websocket
+    // messages. It handles the types making up [cmdname, args, kwargs]
+    // messages: nil, booleans, numbers, strings, binary, arrays and maps.
+    //
+    var Msgpack = (function () {
+        var utf8encoder = window.TextEncoder ? new TextEncoder() : null;
+        var utf8decoder = window.TextDecoder ? new TextDecoder() : null;
+
+        // Encode a value.
+        //
+        // Args:
+        //   value (any): The value to encode.
+        //
+        // Returns:
+        //   bytes (Uint8Array): The encoded value.
+        //
+        var encode = function (value) {
+            var buffer = new Uint8Array(256);
+            var view = new DataView(buffer.buffer);
+            var pos = 0;
+
+            var reserve = function (size) {
+                if (pos + size > buffer.length) {
+                    var grown = new Uint8Array(Math.max(buffer.length * 2, pos + size));
+                    grown.set(buffer);
+                    buffer = grown;
+                    view = new DataView(buffer.buffer);
+                }
+            };
+            var byte = function (b) {
+                reserve(1);
+                buffer[pos++] = b;
+            };
+            var uint16 = function (n) {
+                reserve(2);
+                view.setUint16(pos, n);
+                pos += 2;
+            };
+            var uint32 = function (n) {
+                reserve(4);
+                view.setUint32(pos, n);
+                pos += 4;
+            };
+            // write a type byte and length, for strings, binary, arrays and maps
+            var header = function (length, fixcode, fixmax, code8, code16, code32) {
+                if (length <= fixmax) {
+                    byte(fixcode | length);
+                } else if (code8 && length < 0x100) {
+                    byte(code8);
+                    byte(length);
+                } else if (length < 0x10000) {
+                    byte(code16);
+                    uint16(length);
+                } else {
+                    byte(code32);
+                    uint32(length);
+                }
+            };
+            var raw = function (data) {
+                reserve(data.length);
+                buffer.set(data, pos);
+                pos += data.length;
+            };
+
+            var write = function (value) {
+                if (value === null || value === undefined) {
+                    byte(0xc0);
+                } else if (value === false) {
+                    byte(0xc2);
+                } else if (value === true) {
+                    byte(0xc3);
+                } else if (typeof value === "number") {
+                    if (Number.isInteger(value) && value >= -0x80000000 && value <= 0xffffffff) {
+                        if (value >= 0 && value < 0x80) {
+                            byte(value);
+                        } else if (value < 0 && value >= -32) {
+                            byte(value & 0xff);
+                        } else if (value >= 0) {
+                            byte(0xce);
+                            uint32(value);
+                        } else {
+                            byte(0xd2);
+                            reserve(4);
+                            view.setInt32(pos, value);
+                            pos += 4;
+                        }
+                    } else {
+                        byte(0xcb);
+                        reserve(8);
+                        view.setFloat64(pos, value);
+                        pos += 8;
+                    }
+                } else if (typeof value === "string") {
+                    var data = utf8encoder.encode(value);
+                    header(data.length, 0xa0, 31, 0xd9, 0xda, 0xdb);
+                    raw(data);
+                } else if (value instanceof Uint8Array) {
+                    header(value.length, 0, -1, 0xc4, 0xc5, 0xc6);
+                    raw(value);
+                } else if (Array.isArray(value)) {
+                    header(value.length, 0x90, 15, null, 0xdc, 0xdd);
+                    for (var i = 0; i < value.length; i++) {
+                        write(value[i]);
+                    }
+                } else if (typeof value === "object") {
+                    var keys = Object.keys(value);
+                    header(keys.length, 0x80, 15, null, 0xde, 0xdf);
+                    for (var j = 0; j < keys.length; j++) {
+                        write(keys[j]);
+                        write(value[keys[j]]);
+                    }
+                } else {
+                    write(String(value));
+                }
+            };
+
+            write(value);
+            return buffer.subarray(0, pos);
+        };
+
+        // Decode a value.
+        //
+        // Args:
+        //   bytes (Uint8Array): The encoded value.
+        //
+        // Returns:
+        //   value (any): The decoded value.
+        //
+        var decode = function (bytes) {
+            var view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+            var pos = 0;
+
+            var str = function (length) {
+                var value = utf8decoder.decode(bytes.subarray(pos, pos + length));
+                pos += length;
+                return value;
+            };
+            var bin = function (length) {
+                var value = bytes.slice(pos, pos + length);
+                pos += length;
+                return value;
+            };
+            var array = function (length) {
+                var value = new Array(length);
+                for (var i = 0; i < length; i++) {
+                    value[i] = read();
+                }
+                return value;
+            };
+            var map = function (length) {
+                var value = {};
+                for (var i = 0; i < length; i++) {
+                    var key = read();
+                    value[key] = read();
+                }
+                return value;
+            };
+            // read a number of the given DataView type and byte size
+            var num = function (getter, size) {
+                var value = view[getter](pos);
+                pos += size;
+                return value;
+            };
+            var int64 = function (getter) {
+                var high = view[getter](pos);
+                var low = view.getUint32(pos + 4);
+                pos += 8;
+                return high * 4294967296 + low;
+            };
+
+            var read = function () {
+                var type = bytes[pos++];
+                if (type < 0x80) {
+                    return type;
+                } else if (type < 0x90) {
+                    return map(type & 0x0f);
+                } else if (type < 0xa0) {
+                    return array(type & 0x0f);
+                } else if (type < 0xc0) {
+                    return str(type & 0x1f);
+                } else if (type >= 0xe0) {
+                    return type - 0x100;
+                }
+                switch (type) {
+                    case 0xc0: return null;
+                    case 0xc2: return false;
+                    case 0xc3: return true;
+                    case 0xc4: return bin(num("getUint8", 1));
+                    case 0xc5: return bin(num("getUint16", 2));
+                    case 0xc6: return bin(num("getUint32", 4));
+                    case 0xca: return num("getFloat32", 4);
+                    case 0xcb: return num("getFloat64", 8);
+                    case 0xcc: return num("getUint8", 1);
+                    case 0xcd: return num("getUint16", 2);
+                    case 0xce: return num("getUint32", 4);
+                    case 0xcf: return int64("getUint32");
+                    case 0xd0: return num("getInt8", 1);
+                    case 0xd1: return num("getInt16", 2);
+                    case 0xd2: return num("getInt32", 4);
+                    case 0xd3: return int64("getInt32");
+                    case 0xd9: return str(num("getUint8", 1));
+                    case 0xda: return str(num("getUint16", 2));
+                    case 0xdb: return str(num("getUint32", 4));
+                    case 0xdc: return array(num("getUint16", 2));
+                    case 0xdd: return array(num("getUint32", 4));
+                    case 0xde: return map(num("getUint16", 2));
+                    case 0xdf: return map(num("getUint32", 4));
+                }
+                throw new Error("Unsupported msgpack type 0x" + type.toString(16));
+            };
+
+            return read();
+        };
+
+        return {encode: encode, decode: decode, supported: !!(utf8encoder && utf8decoder)};
+    })();
+
     // Websocket Connector
     //
     var WebsocketConnection = function () {
@@ -220,6 +445,8 @@ An "emitter" object must have a function
         var websocket = null;
         var wsurl = window.wsurl;
         var csessid = window.csessid;
+        // the framing agreed on with the server, "json" or "msgpack"
+        var framing = "json";
 
         var connect = function() {
             if (websocket && websocket.readyState != websocket.CLOSED) {
@@ -228,11 +455,17 @@ An "emitter" object must have a function
             }
             // Important - we pass csessid tacked on the url
             websocket = new WebSocket(wsurl + '?' + csessid + '&' + browser);
+            websocket.binaryType = "arraybuffer";
+            framing = "json";
 
             // Handle Websocket open event
             websocket.onopen = function (event) {
                 open = true;
                 ever_open = true;
+                if (Msgpack.supported) {
+                    // ask the server for binary framing
+                    websocket.send(JSON.stringify(["client_framing", ["msgpack"], {}]));
+                }
                 Evennia.emit('connection_open', ["websocket"], event);
             };
             // Handle Websocket close event
@@ -262,21 +495,38 @@ An "emitter" object must have a function
             // Handle incoming websocket data [cmdname, args, kwargs]
             websocket.onmessage = function (event) {
                 var data = event.data;
-                if (typeof data !== 'string' && data.length < 0) {
-                    return;
+                if (typeof data === 'string') {
+                    if (data.length === 0) {
+                        return;
+                    }
+                    data = JSON.parse(data);
+                } else {
+                    if (data.byteLength === 0) {
+                        return;
+                    }
+                    data = Msgpack.decode(new Uint8Array(data));
                 }
-                // Parse the incoming data, send to emitter
+                // Send the parsed data to the emitter
                 // Incoming data is on the form [cmdname, args, kwargs]
-                data = JSON.parse(data);
                 // console.log(" server->client:", data)
+                if (data[0] === "client_framing") {
+                    // the server's answer to our framing request
+                    framing = data[1][0];
+                    log("Websocket framing: " + framing);
+                    return;
+                }
                 Evennia.emit(data[0], data[1], data[2]);
             };
         }
 
         var msg = function(data) {
-            // send data across the wire. Make sure to json it.
+            // send data across the wire, encoded as agreed with the server.
             // console.log("client->server:", data)
-            websocket.send(JSON.stringify(data));
+            if (framing === "msgpack") {
+                websocket.send(Msgpack.encode(data));
+            } else {
+                websocket.send(JSON.stringify(data));
+            }
         };
 
         var close = function() {
@@ -298,23 +548,33 @@ An "emitter" object must have a function
 
     // AJAX/COMET Connector
     //
+    // If the server supports batching (it says so in its reply to init),
+    // each poll returns every message the server has queued for us, and
+    // messages sent while an input request is underway are queued and
+    // sent together in the next one. Otherwise messages are received and
+    // sent one at a time.
+    //
     var AjaxCometConnection = function() {
         log("Trying ajax ...");
         var open = false;
         var stop_polling = false;
         var is_closing = false;
         var csessid = window.csessid;
+        var batching = false;   // the server supports batching
+        var outbox = [];        // input waiting to be sent
+        var sending = false;    // an input request is underway
 
         // initialize connection, send csessid
         var init = function() {
             $.ajax({type: "POST", url: "/webclientdata",
                     async: true, cache: false, timeout: 50000,
                     datatype: "json",
-                    data: {mode: "init", csessid: csessid, browserstr: browser},
+                    data: {mode: "init", csessid: csessid, browserstr: browser, batch: 1},
 
                     success: function(data) {
                         open = true;
                         data = JSON.parse(data);
+                        batching = data.batch === true;
                         log ("connection_open", ["AJAX/COMET"], data);
                         stop_polling = false;
                         poll();
@@ -329,9 +589,41 @@ An "emitter" object must have a function
             });
         };
 
+        // Send all queued input to the server in one request.
+        var sendOutbox = function() {
+            if (sending || outbox.length === 0) {
+                return;
+            }
+            sending = true;
+            var batch = outbox;
+            outbox = [];
+            $.ajax({type: "POST", url: "/webclientdata",
+                   async: true, cache: false, timeout: 30000,
+                   dataType: "json",
+                   data: {mode: 'input_batch', data: JSON.stringify(batch), 'csessid': csessid},
+                   success: function(req, stat, err) {
+                       sending = false;
+                       stop_polling = false;
+                       sendOutbox();
+                   },
+                   error: function(req, stat, err) {
+                       sending = false;
+                       Evennia.emit("connection_error", ["AJAX/COMET send error"], err);
+                       log("AJAX/COMET: Server returned error.",req,stat,err);
+                       stop_polling = true;
+                   }
+           });
+        };
+
         // Send Client -> Evennia. Called by Evennia.msg
         var msg = function(data, inmode) {
             // log("ajax.msg:", data, JSON.stringify(data));
+            if (inmode == null && batching) {
+                // normal input is queued and sent in batches
+                outbox.push(data);
+                sendOutbox();
+                return;
+            }
             $.ajax({type: "POST", url: "/webclientdata",
                    async: true, cache: false, timeout: 30000,
                    dataType: "json",
@@ -356,15 +648,21 @@ An "emitter" object must have a function
             $.ajax({type: "POST", url: "/webclientdata",
                     async: true, cache: false, timeout: 60000,
                     dataType: "json",
-                    data: {mode: 'receive', 'csessid': csessid},
-                    success: function(data) {
-                        // log("ajax data received:", data);
-                        if (data[0] === "ajax_keepalive") {
-                            // special ajax keepalive check - return immediately
-                            msg("", "keepalive");
-                        } else {
-                            // not a keepalive
-                            Evennia.emit(data[0], data[1], data[2]);
+                    data: {mode: batching ? 'poll' : 'receive', 'csessid': csessid},
+                    success: function(batch) {
+                        // log("ajax data received:", batch);
+                        if (!batching) {
+                            batch = [batch];
+                        }
+                        for (var n = 0; n < batch.length; n++) {
+                            var data = batch[n];
+                            if (data[0] === "ajax_keepalive") {
+                                // special ajax keepalive check - return immediately
+                                msg("", "keepalive");
+                            } else {
+                                // not a keepalive
+                                Evennia.emit(data[0], data[1], data[2]);
+                            }
                         }
                         stop_polling = false;
                         poll(); // immiately start a new request
@@ -11,9 +11,7 @@ let defaultout_plugin = (function () {
         // append message to default pane, then scroll so latest is at the bottom.
         var mwin = $("#messagewindow");
         var cls = kwargs == null ? 'out' : kwargs['cls'];
-        mwin.append("<div class='" + cls + "'>" + args[0] + "</div>");
-        var scrollHeight = mwin.parent().parent().prop("scrollHeight");
-        mwin.parent().parent().animate({ scrollTop: scrollHeight }, 0);
+        window.scrollback.add(mwin, "<div class='" + cls + "'>" + args[0] + "</div>", mwin.parent().parent());
 
         return true;
     }
@@ -42,13 +40,13 @@ let defaultout_plugin = (function () {
     // By default just show an error for the Unhandled Event.
     var onUnknownCmd = function (cmdname, args, kwargs) {
         var mwin = $("#messagewindow");
-        mwin.append(
+        window.scrollback.add(mwin,
             "<div class='msg err'>"
             + "Error or Unhandled event:<br>"
             + cmdname + ", "
             + JSON.stringify(args) + ", "
-            + JSON.stringify(kwargs) + "<p></div>");
-        mwin.scrollTop(mwin[0].scrollHeight);
+            + JSON.stringify(kwargs) + "<p></div>",
+            mwin.parent().parent());
 
         return true;
     }
@@ -640,12 +640,15 @@ let goldenlayout = (function () {
         let updateMethod = textDiv.attr("updateMethod");
 
         if ( updateMethod === "replace" ) {
+            window.scrollback.clear(textDiv);
             textDiv.html(message);
         } else if ( updateMethod === "append" ) {
             textDiv.append(message);
         } else {  // line feed
+            // each message is one element, so it can be kept in the scrollback
             var cls = (kwargs === undefined) || (kwargs['cls'] === undefined) ? 'out' : kwargs['cls'];
-            textDiv.append("<div class='" + cls + "'>" + message + "</div>");
+            window.scrollback.add(textDiv, "<div class='" + cls + "'>" + message + "</div>");
+            return;
         }
 
         // Calculate the scrollback state.
@@ -20,8 +20,11 @@ var text2html_plugin = (function () {
     let background = "";          // state tracker for background css
     let underline  = "";          // state tracker for underlines css
 
-    let pipecodes = /^(\|\[?[0-5][0-5][0-5])|(\|\[[0-9][0-9]?m)|(\|\[?=[a-z])|(\|[![]?[unrgybmcwxhRGYBMCWXH_/>*^-])/;
-    // example         ^|000                or ^|[22m         or  ^|=a      or ^|_
+    // matches a pipecode at the position set in lastIndex
+    let pipecodes = /\|\[?[0-5][0-5][0-5]|\|\[[0-9][0-9]?m|\|\[?=[a-z]|\|[![]?[unrgybmcwxhRGYBMCWXH_/>*^-]/y;
+    // example         |000                or |[22m             or |=a       or |_
+
+    let literalPipe = "\uE000"; // stands in for a literal | in text using ESC codes
 
     let csslookup = {
         "|n": "normal",
@@ -117,18 +120,16 @@ var text2html_plugin = (function () {
         "|[37m": "color-015",
     }
 
-    function ascii (l) {
-        let a = new String(l); // force string
-        return a.charCodeAt(0);
-    }
-
-    // dumb convert any leading or trailing spaces/tabs to &nbsp; sequences
-    var handleSpaces = function (text) {
-        // TODO should probably get smart about replacing spaces inside "normal" text
-        return text.replace( /\t/g, "&nbsp;&nbsp;&nbsp;&nbsp;").replace( / /g, "&nbsp;");
+    let htmlEscapes = {
+        "&": "&amp;",
+        "<": "&lt;",
+        ">": "&gt;",
+        '"': "&quot;",
+        "'": "&apos;",
+        "\t": "&nbsp;&nbsp;&nbsp;&nbsp;",
+        " ": "&nbsp;",
     }
 
-
     // javascript doesn't have a native sprintf-like function
     function zfill(string, size) {
         while (string.length < size) string = "0" + string;
@@ -136,67 +137,42 @@ var text2html_plugin = (function () {
     }
 
 
-    // given string starting with a pipecode  |xx
-    //   return the css (if any) and text remainder
-    var pipe2css = function(pipecode) {
-        let regx = "";
-        let css = "color-102";
-
-        regx = /^(\|\[?[nrgybmcwxhRGYBMCWX])/;
-        css = pipecode.match( regx );
-        if( css != null ) {
-            return csslookup[ css[1] ];
-        }
-
-        regx = /^(\|\[?=[a-z])/;
-        css = pipecode.match( regx );
-        if( css != null ) {
-            return csslookup[ css[1] ];
+    // true if a string is three xterm256 color digits, like "520"
+    function isXterm (digits) {
+        if( digits.length !== 3 ) { return false; }
+        for( let n=0; n<3; n++ ) {
+            if( digits[n] < "0" || digits[n] > "5" ) { return false; }
         }
+        return true;
+    }
 
-        regx = /^(\|\[[0-9][0-9]?m)/;
-        css = pipecode.match( regx );
-        if( css != null ) {
-            return csslookup[ css[1] ];
-        }
 
-        regx = /^(\|n)/;
-        css = pipecode.match( regx );
-        if( css != null ) {
-            return "normal";
+    // given a pipecode |xx
+    //   return the css (if any)
+    var pipe2css = function(pipecode) {
+        if( pipecode in csslookup ) {
+            return csslookup[ pipecode ];
         }
-
-        regx = /^(\|u)/;
-        css = pipecode.match( regx );
-        if( css != null ) {
+        if( pipecode === "|u" ) {
             return "underline";
         }
 
-        regx = /^\|([0-5][0-5][0-5])/;
-        css = pipecode.match( regx );
-        if( css != null ) {
-            return "color-" + zfill( (parseInt(css[1], 6) + 16).toString(), 3);
+        // xterm256 colors, |123 or |[123
+        if( isXterm( pipecode.substr(1) ) ) {
+            return "color-" + zfill( (parseInt(pipecode.substr(1), 6) + 16).toString(), 3);
         }
-
-        regx = /^\|\[([0-5][0-5][0-5])/;
-        css = pipecode.match( regx );
-        if( css != null ) {
-            return "bgcolor-" + zfill( (parseInt(css[1], 6) + 16).toString(), 3);
+        if( pipecode[1] === "[" && isXterm( pipecode.substr(2) ) ) {
+            return "bgcolor-" + zfill( (parseInt(pipecode.substr(2), 6) + 16).toString(), 3);
         }
 
-        return css;
+        return null;
     }
 
 
-    // convert any HTML sensitive characters to &code; format
+    // convert any HTML sensitive characters to &code; format,
+    // and spaces/tabs to &nbsp; sequences
     var htmlEscape = function (text) {
-        text = text.replace(/&/g, "&amp;");
-        text = text.replace(/</g, "&lt;");
-        text = text.replace(/>/g, "&gt;");
-        text = text.replace(/"/g, "&quot;");
-        text = text.replace(/'/g, "&apos;");
-        text = handleSpaces(text);
-        return text;
+        return text.replace( /[&<>"'\t ]/g, function (c) { return htmlEscapes[c]; } );
     }
 
 
@@ -229,72 +205,92 @@ var text2html_plugin = (function () {
 
 
     /*
-     *
+     * Convert text with pipecodes to HTML, with one <div> per line and one
+     * <span> per run of text in the same colors. This is done in a single
+     * pass over the text.
      */
     var parse2HTML = function (text) {
-        let html = "";
         foreground = "color-102"; // state tracker for foreground css
         background = "";          // state tracker for background css
         underline  = "";          // state tracker for underlines css
 
-        // HACK: parse TELNET ASCII byte-by-byte, convert ESC's to |'s -- serverside "raw" bug?
+        // HACK: telnet ASCII ESC's are used as |'s -- serverside "raw" bug?
         //       Bug is further proven out by the fact that |'s don't come through as doubles.
-        let hack = new RegExp( String.fromCharCode(27) );
-        if( text.match( hack ) ) {
-            let chars = text.split(''); // to characters
-            for( let n=0; n<chars.length; n++ ) {
-                if( chars[n] === '|' ) {
-                    console.log( 'Got Pipe' );
-                    chars[n] = "&#124;";
-                }
-                if( ascii(chars[n]) === 27 ) {
-                    chars[n] = '|';
-                }
-            }
-            text = chars.join(''); // from character strings
+        if( text.indexOf( asciiESC ) !== -1 ) {
+            text = text.replace( /\|/g, literalPipe ).split( asciiESC ).join( "|" );
         }
 
-        let strings = text.split( /(\n|\|[\/])/ ); // newline or pipe-slash
-        for( let x=0; x<strings.length; x++ ) {
-            // hack double pipes -- convert them temporarily to HTML -- &#124;
-            var string = strings[x].replace( /\|\|/g, "&#124;" );
+        let html = "";
+        let line = "";           // html of the finished spans of the current line
+        let lineEmpty = true;    // the current line has no text or pipecodes yet
+        let css = "color-102";   // css of the current span
+        let span = "";           // text of the current span
+        let spanIsCode = false;  // the current span was started by a pipecode
+
+        let closeSpan = function () {
+            // leading text of a line is shown in the default color
+            if( spanIsCode || span.length > 0 ) {
+                line += "<span class='" + css + "'>" + htmlEscape(span) + "</span>";
+            }
+            span = "";
+        };
 
+        let closeLine = function () {
+            closeSpan();
             // special case for blank lines, avoid <div>'s with no HTML height
-            if( string === "" ) {
-                html += "<div>&nbsp;</div>";
+            html += lineEmpty ? "<div>&nbsp;</div>" : "<div>" + line + "</div>";
+            line = "";
+            lineEmpty = true;
+            css = "color-102";
+            spanIsCode = false;
+        };
+
+        let pos = 0;
+        while( pos < text.length ) {
+            let c = text[pos];
+
+            if( c === "\n" ) {
+                closeLine();
+                pos += 1;
                 continue;
             }
+            lineEmpty = false;
+
+            if( c === "|" ) {
+                let next = text[pos + 1];
+                if( next === "/" ) {
+                    // pipe-slash is a newline
+                    closeLine();
+                    pos += 2;
+                    continue;
+                }
+                if( next === "|" ) {
+                    // double pipes are a literal pipe
+                    span += "|";
+                    pos += 2;
+                    continue;
+                }
 
-            html += "<div>";
-
-            let spans = string.split( "|" );
-
-            // this split means there are 2 possible cases
-
-            //   possibly-0-length leading span with "default" styling (may be the ONLY span)
-            let span = spans[0].replaceAll("&#124;", "|"); // avoid htmlEscape mangling literal |'s
-            if( span.length > 0 ) {
-                html += "<span class='color-102'>" + htmlEscape(span) + "</span>";
-            }
-
-            //   "standard" span array of [xxxtext1, xxtext2, xxtext3], where x's are pipe-codes
-            for( let n=1; n<spans.length; n++ ) {
-                span = "|" + spans[n].replaceAll("&#124;", "|"); // avoid htmlEscape mangling |'s
-                let pipecode = "";
-                let remainder = span;
-
-                let tags = span.match( pipecodes ); // match against large pipecode regex
+                closeSpan();
+                spanIsCode = true;
+                pipecodes.lastIndex = pos;
+                let tags = pipecodes.exec( text );
                 if( tags != null ) {
-                    pipecode = tags[0];                       // matched text is the pipecode
-                    remainder = span.replace( pipecode, "" ); // everything but the pipecode
+                    css = trackCSS( pipe2css( tags[0] ) ); // find css associated with pipe-code
+                    pos += tags[0].length;
+                } else {
+                    // not a pipecode, show it as it is
+                    css = trackCSS( null );
+                    span = "|";
+                    pos += 1;
                 }
-
-                let css = trackCSS( pipe2css( pipecode ) ); // find css associated with pipe-code
-                html += "<span class='" + css + "'>" + htmlEscape(remainder) + "</span>";
+                continue;
             }
 
-            html += "</div>";
+            span += (c === literalPipe) ? "|" : c;
+            pos += 1;
         }
+        closeLine();
 
         return html;
     }
@@ -305,9 +301,11 @@ var text2html_plugin = (function () {
         if( !("text2html" in options) || options["text2html"] === false ) { return; }
 
         var mwins = window.plugins["goldenlayout"].routeMessage(args, kwargs);
+        if( mwins.length === 0 ) { return; }
+
+        var html = "<div>" + parse2HTML( args[0] ) + "</div>"; // the heavy workload
         mwins.forEach( function (mwin) {
-            mwin.append( parse2HTML( args[0]) ); // the heavy workload
-            mwin.scrollTop(mwin[0].scrollHeight);
+            window.scrollback.add(mwin, html);
         });
     }
 
@@ -18,6 +18,9 @@
  * other plugins a chance to modify the event and then uses
  * Evennia.msg(cmdname, args, kwargs, [callback]) to finally send the data.
  *
+ * Plugins showing text output add it through scrollback.add(), which
+ * keeps the DOM of long-running sessions small, see below.
+ *
  */
 
 //
@@ -260,6 +263,150 @@ var plugin_handler = (function () {
 })();
 
 
+//
+// Global scrollback handler
+//
+// Output panes only keep their newest messages in the DOM. Every message
+// is also kept, as an HTML string, in a fixed-size ring buffer per pane.
+// Scrolling to the top of a pane puts older messages from the buffer back
+// into the DOM a page at a time, and they are dropped from the DOM again
+// once the pane is scrolled back to the bottom.
+//
+// Messages are written to the DOM once per animation frame, so a burst of
+// messages causes a single DOM update and a single scroll per pane.
+//
+var scrollback = (function () {
+    "use strict"
+
+    var maxDomMessages = 500;   // messages kept in the DOM of a pane
+    var maxMessages = 10000;    // messages kept in the ring buffer of a pane
+    var pageSize = 100;         // older messages put back per scroll to the top
+
+    var panes = [];             // state of every pane that got messages
+    var frameRequested = false;
+
+    // Get the state of a pane, setting it up on first use.
+    //
+    // Args:
+    //   div (jQuery): The element messages are added to.
+    //   scrollDiv (jQuery): The element that scrolls, if not div itself.
+    //
+    var getPane = function (div, scrollDiv) {
+        var pane = div.data("scrollback");
+        if (pane) {
+            return pane;
+        }
+        pane = {
+            div: div[0],
+            scrollDiv: (scrollDiv || div)[0],
+            ring: new Array(maxMessages),
+            total: 0,       // messages ever added
+            domStart: 0,    // number of the oldest message in the DOM
+            pending: [],
+        };
+        div.data("scrollback", pane);
+        $(pane.scrollDiv).on("scroll", function () {
+            if (pane.scrollDiv.scrollTop === 0) {
+                showOlder(pane);
+            }
+        });
+        panes.push(pane);
+        return pane;
+    };
+
+    var isAtBottom = function (pane) {
+        var scroller = pane.scrollDiv;
+        return scroller.scrollHeight - scroller.scrollTop - scroller.clientHeight < 2;
+    };
+
+    // Put the previous page of buffered messages back into the DOM,
+    // keeping the visible messages in place.
+    var showOlder = function (pane) {
+        var oldest = Math.max(0, pane.total - maxMessages);
+        var start = Math.max(oldest, pane.domStart - pageSize);
+        if (start >= pane.domStart) {
+            return;
+        }
+        var html = "";
+        for (var n = start; n < pane.domStart; n++) {
+            html += pane.ring[n % maxMessages];
+        }
+        var scroller = pane.scrollDiv;
+        var height = scroller.scrollHeight;
+        pane.div.insertAdjacentHTML("afterbegin", html);
+        scroller.scrollTop += scroller.scrollHeight - height;
+        pane.domStart = start;
+    };
+
+    // Write the pending messages of every pane to the DOM.
+    var flush = function () {
+        frameRequested = false;
+        panes = panes.filter(function (pane) {
+            return document.body.contains(pane.div);
+        });
+        panes.forEach(function (pane) {
+            if (pane.pending.length === 0) {
+                return;
+            }
+            var atBottom = isAtBottom(pane);
+            pane.div.insertAdjacentHTML("beforeend", pane.pending.join(""));
+            pane.pending = [];
+
+            if (atBottom) {
+                // only trim while at the bottom, so a reader scrolled
+                // back does not have the text moved under them
+                while (pane.total - pane.domStart > maxDomMessages && pane.div.firstChild) {
+                    pane.div.removeChild(pane.div.firstChild);
+                    pane.domStart++;
+                }
+                var scroller = pane.scrollDiv;
+                scroller.scrollTop = scroller.scrollHeight - scroller.clientHeight;
+            }
+        });
+    };
+
+    // Add a message to a pane. It is shown on the next animation frame.
+    //
+    // Args:
+    //   div (jQuery): The element the message is added to. Every message
+    //     must be a single element.
+    //   html (str): The message.
+    //   scrollDiv (jQuery, optional): The element that scrolls, if not div.
+    //
+    var add = function (div, html, scrollDiv) {
+        var pane = getPane(div, scrollDiv);
+        pane.ring[pane.total % maxMessages] = html;
+        pane.total++;
+        pane.pending.push(html);
+        if (!frameRequested) {
+            frameRequested = true;
+            window.requestAnimationFrame(flush);
+        }
+    };
+
+    // Forget the messages of a pane, such as when its content is replaced.
+    //
+    // Args:
+    //   div (jQuery): The element messages were added to.
+    //
+    var clear = function (div) {
+        var pane = div.data("scrollback");
+        if (pane) {
+            pane.ring = new Array(maxMessages);
+            pane.total = 0;
+            pane.domStart = 0;
+            pane.pending = [];
+        }
+    };
+
+    return {
+        add: add,
+        clear: clear,
+        flush: flush,
+    }
+})();
+
+
 //
 // Webclient Initialization
 //
@@ -18,12 +18,127 @@ search functionality:
         indicating that the 1st or 2nd match for "ball" should be
         used.
 
-This module is not called by default, to use it, add the following
-line to your settings file:
+This module is used through the following line in the settings file:
 
     SEARCH_AT_RESULT = "server.conf.at_search.at_search_result"
 
+Object searches made through `CustomObject.search` find their matches
+in the name indexes of the searcher and its location (see
+`world.name_index`) with `search_index` below, and only then come here,
+the same as searches that went to the database. Both kinds of results
+are handled by Evennia's default `at_search_result`.
+
+`search_index` ranks what it finds: objects with a key or alias equal
+to the search string come first, then objects with names the search
+words are prefixes of. Only the best of these tiers is returned, with
+the objects held by the searcher listed first, so "2-sword" picks the
+second sword of the list the searcher was shown. For searches made
+with `fuzzy=True`, when neither tier has a match, `search_fuzzy` finds
+the names most similar to the search string, so that a typo such as
+"wear hlemet" still finds the helmet.
+
 """
+import re
+
+from django.conf import settings
+
+from evennia.utils.utils import at_search_result as _default_at_search_result
+
+_MULTIMATCH_REGEX = re.compile(settings.SEARCH_MULTIMATCH_REGEX, re.I + re.U)
+
+
+def _rank(matches, caller):
+    """
+    Order matches with the objects held by the caller first, then by id.
+
+    """
+    return sorted(set(matches), key=lambda obj: (obj.location != caller, obj.id))
+
+
+def _search_tiers(caller, query, exact=False):
+    """
+    Find the best matching tier of objects around the caller.
+
+    """
+    location = caller.location
+    matches = caller.name_index.exact(query)
+    if location:
+        names = {location.key.lower()}
+        names.update(alias.lower() for alias in location.aliases.all())
+        if query.lower() in names:
+            matches.append(location)
+        matches.extend(location.name_index.exact(query))
+
+    if not matches and not exact:
+        # keys first, then aliases
+        for aliases in (False, True):
+            matches = caller.name_index.partial(query, aliases=aliases)
+            if location:
+                matches.extend(location.name_index.partial(query, aliases=aliases))
+            if matches:
+                break
+
+    return _rank(matches, caller)
+
+
+def search_index(caller, query, exact=False):
+    """
+    Find the objects around the caller matching a search string, using
+    the name indexes of the caller and its location. Like Evennia's
+    object search, this looks for an exact key or alias match first, and
+    for a partial match if there is none. A search string such as
+    "2-sword" picks one of the matches of "sword".
+
+    Args:
+        caller (Object): The searching object.
+        query (str): The search string.
+        exact (bool, optional): Only look for an exact match.
+
+    Returns:
+        matches (list): The matching objects, held objects first, or an
+            empty list if there are none or the search string needs a
+            database search, such as a dbref or "here".
+
+    """
+    query = query.strip()
+    if not query or query.startswith("#") or query.lower() in ("here", "me", "self"):
+        return []
+
+    matches = _search_tiers(caller, query, exact=exact)
+    if not matches:
+        match = _MULTIMATCH_REGEX.match(query)
+        if match:
+            number = int(match.group("number")) - 1
+            matches = _search_tiers(caller, match.group("name").strip(), exact=exact)
+            matches = [matches[number]] if 0 <= number < len(matches) else []
+    return matches
+
+
+def search_fuzzy(caller, query):
+    """
+    Find the objects around the caller with the names most similar to a
+    search string, for fuzzy searches that found nothing otherwise.
+
+    Args:
+        caller (Object): The searching object.
+        query (str): The search string.
+
+    Returns:
+        matches (list): The objects with the highest similarity score,
+            held objects first. Empty if no object scores at least
+            `settings.SEARCH_FUZZY_THRESHOLD`.
+
+    """
+    if _MULTIMATCH_REGEX.match(query.strip()):
+        # an out of range "3-sword" is no typo
+        return []
+    scored = caller.name_index.fuzzy(query)
+    if caller.location:
+        scored.extend(caller.location.name_index.fuzzy(query))
+    if not scored:
+        return []
+    best = max(score for score, _ in scored)
+    return _rank([obj for score, obj in scored if score == best], caller)
 
 
 def at_search_result(matches, caller, query="", quiet=False, **kwargs):
@@ -52,3 +167,4 @@ def at_search_result(matches, caller, query="", quiet=False, **kwargs):
             already have happened.
 
     """
+    return _default_at_search_result(matches, caller, query=query, quiet=quiet, **kwargs)
@@ -15,6 +15,7 @@ at_server_cold_start()
 at_server_cold_stop()
 
 """
+from world import prototype_cache, writebehind
 
 
 def at_server_start():
@@ -22,7 +23,7 @@ def at_server_start():
     This is called every time the server starts up, regardless of
     how it was shut down.
     """
-    pass
+    prototype_cache.build()
 
 
 def at_server_stop():
@@ -30,7 +31,7 @@ def at_server_stop():
     This is called just before the server is shut down, regardless
     of it is for a reload, reset or shutdown.
     """
-    pass
+    writebehind.flush()
 
 
 def at_server_reload_start():
@@ -44,7 +45,7 @@ def at_server_reload_stop():
     """
     This is called only time the server stops before a reload.
     """
-    pass
+    writebehind.flush()
 
 
 def at_server_cold_start():
@@ -29,7 +29,90 @@ your settings file:
 
     COMMAND_PARSER = "server.conf.cmdparser.cmdparser"
 
+This parser builds a prefix trie over the keys and aliases of each
+merged cmdset it sees and keeps it on that cmdset, so finding the
+candidates for an input only walks the characters of the input instead
+of comparing it to every command name. Merged cmdsets are reused
+between inputs when they come from the merge cache (see
+`commands.merging`), and so are their tries. A cmdset changed with
+`add` or `remove` gets a new trie.
+Inputs the trie cannot match (such as `2-look` or inputs relying on
+`CMD_IGNORE_PREFIXES`) are handed to Evennia's default parser.
+
 """
+from evennia.commands.cmdparser import cmdparser as default_cmdparser, create_match
+
+# terminal marker in trie nodes, never a character
+_END = None
+
+
+def build_trie(cmdset):
+    """
+    Build a prefix trie over all command keys and aliases of a cmdset.
+
+    Args:
+        cmdset (CmdSet): The merged cmdset.
+
+    Returns:
+        trie (dict): Nested dicts keyed by lower-case character. The
+            `_END` key of a node holds `(cmdname, cmdobj)` tuples for the
+            command names ending there.
+
+    """
+    trie = {}
+    for cmd in cmdset.commands:
+        for cmdname in [cmd.key] + cmd.aliases:
+            if not cmdname:
+                continue
+            node = trie
+            for char in cmdname.lower():
+                node = node.setdefault(char, {})
+            node.setdefault(_END, []).append((cmdname, cmd))
+    return trie
+
+
+def get_trie(cmdset):
+    """
+    Get the cached trie for a merged cmdset, building it if needed.
+
+    Args:
+        cmdset (CmdSet): The merged cmdset.
+
+    Returns:
+        trie (dict): The trie, see `build_trie`.
+
+    """
+    version = getattr(cmdset, "merge_version", 0)
+    cached = getattr(cmdset, "parser_trie", None)
+    if cached is None or cached[0] != version:
+        cached = cmdset.parser_trie = (version, build_trie(cmdset))
+    return cached[1]
+
+
+def trie_matches(raw_string, cmdset):
+    """
+    Find all commands whose key or alias starts the input.
+
+    Args:
+        raw_string (str): The input.
+        cmdset (CmdSet): The merged cmdset.
+
+    Returns:
+        matches (list): Match tuples as made by `create_match`.
+
+    """
+    matches = []
+    node = get_trie(cmdset)
+    lowered = raw_string.lower()
+    for index, char in enumerate(lowered):
+        node = node.get(char)
+        if node is None:
+            break
+        for cmdname, cmd in node.get(_END, ()):
+            # like Evennia, match arg_regex against the lower case input
+            if not cmd.arg_regex or cmd.arg_regex.match(lowered[index + 1:]):
+                matches.append(create_match(cmdname, raw_string, cmd, cmdname))
+    return matches
 
 
 def cmdparser(raw_string, cmdset, caller, match_index=None):
@@ -52,4 +135,31 @@ def cmdparser(raw_string, cmdset, caller, match_index=None):
             (possibly) separate multiple matches.
 
     """
-    # Your implementation here
+    if not raw_string:
+        return []
+
+    matches = [match for match in trie_matches(raw_string, cmdset)
+               if match[2].access(caller, "cmd")]
+    if not matches:
+        return default_cmdparser(raw_string, cmdset, caller, match_index=match_index)
+
+    if len(matches) > 1:
+        # prefer matches where the case of the input matches too
+        trimmed = [match for match in matches if raw_string.startswith(match[0])]
+        if trimmed:
+            matches = trimmed
+
+    if len(matches) > 1:
+        # keep the longest command names
+        best = max(match[3] for match in matches)
+        matches = [match for match in matches if match[3] == best]
+
+    if len(matches) > 1:
+        # keep the best match ratio
+        best = max(match[4] for match in matches)
+        matches = [match for match in matches if match[4] == best]
+
+    if len(matches) > 1 and match_index is not None and 0 < match_index <= len(matches):
+        matches = [matches[match_index - 1]]
+
+    return matches
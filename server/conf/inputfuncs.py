@@ -25,6 +25,43 @@ as argument.
     default(session, cmdname, *args, **kwargs)
 
 """
+from django.conf import settings
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+_WEBCLIENT_BINARY_FRAMING = settings.WEBCLIENT_BINARY_FRAMING
+
+# the protocol_key of Evennia's websocket webclient sessions
+_WEBSOCKET_PROTOCOL_KEY = "webclient/websocket"
+
+
+def client_framing(session, *args, **kwargs):
+    """
+    Lets the webclient ask for a message framing other than JSON. The
+    choice is stored as the FRAMING protocol flag, which the Portal's
+    websocket protocol uses to frame its messages (see
+    `server/conf/portal_protocols.py`), and is sent back to the client.
+
+    Args:
+        session (Session): The active Session.
+        args (list of str): The framings the client supports, in order
+            of preference. Only "msgpack" is known besides "json".
+
+    """
+    framing = "json"
+    if (_WEBCLIENT_BINARY_FRAMING and msgpack is not None
+            and session.protocol_key == _WEBSOCKET_PROTOCOL_KEY and "msgpack" in args):
+        framing = "msgpack"
+
+    session.protocol_flags["FRAMING"] = framing
+    # the Portal session sends the messages, so it must know about it
+    session.sessionhandler.session_portal_partial_sync(
+        {session.sessid: {"protocol_flags": session.protocol_flags}})
+    session.msg(client_framing=([framing], {}))
+
 
 # def oob_echo(session, *args, **kwargs):
 #     """
@@ -0,0 +1,431 @@
+"""
+Portal protocols
+
+Subclasses of Evennia's telnet and websocket protocols that control how
+output is compressed, and unpack the output batches sent by the
+Server's sessions (see `server/conf/serversession.py`). They are used
+through these lines in the settings file:
+
+    TELNET_PROTOCOL_CLASS = "server.conf.portal_protocols.TelnetProtocol"
+    WEBSOCKET_PROTOCOL_CLASS = "server.conf.portal_protocols.WebSocketClient"
+
+Telnet clients that support MCCP2 get one zlib stream per connection,
+at level `settings.MCCP_COMPRESSION_LEVEL` instead of Evennia's fixed
+level 9. Websocket clients (every browser running the webclient) are
+offered permessage-deflate, with one compressor per connection kept
+between messages. Its window size and memory level are set through
+autobahn's offer accept, from `settings.WEBSOCKET_COMPRESSION_WINDOW_BITS`
+and `settings.WEBSOCKET_COMPRESSION_MEM_LEVEL`. Autobahn has no public
+setting for the level, so `settings.WEBSOCKET_COMPRESSION_LEVEL` is only
+applied by autobahn versions that still create their compressor lazily
+in `PerMessageDeflate._compressor`; others use zlib's default level.
+Compression is turned off by setting `WEBSOCKET_COMPRESSION` to False.
+
+The bytes handed to the compressors and the bytes they produce are
+counted per protocol in `COMPRESSION_STATS`. They are logged regularly
+by the service started in `portal_services_plugins`.
+
+Websocket messages are JSON text by default. A webclient that supports
+it can ask for msgpack binary frames through the `client_framing`
+inputfunc (see `server/conf/inputfuncs.py`), which sets the session's
+FRAMING protocol flag. Binary frames from the client are always read as
+msgpack, text frames as JSON. This needs the `msgpack` package, without
+it every client keeps using JSON.
+
+Webclients that cannot use websockets fall back to AJAX long-polling at
+/webclientdata. `BatchedAjaxWebClient`, put in place by
+`web_plugins.at_webproxy_root_creation`, lets them receive all output
+queued for them in one poll response, and send all their queued input
+in one request.
+
+"""
+import html
+import json
+import re
+import time
+import zlib
+
+from autobahn.exception import Disconnected
+from autobahn.websocket.compress import PerMessageDeflateOffer, PerMessageDeflateOfferAccept
+from django.conf import settings
+from twisted.internet import reactor
+from twisted.web import server
+
+from evennia.server.portal.telnet import TelnetProtocol as BaseTelnetProtocol
+from evennia.server.portal.webclient import WebSocketClient as BaseWebSocketClient
+from evennia.server.portal.webclient_ajax import AjaxWebClient, jsonify
+from evennia.utils import logger
+from evennia.utils.ansi import parse_ansi
+from evennia.utils.text2html import parse_html
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+_MCCP_COMPRESSION_LEVEL = settings.MCCP_COMPRESSION_LEVEL
+_WEBSOCKET_COMPRESSION = settings.WEBSOCKET_COMPRESSION
+_WEBSOCKET_COMPRESSION_LEVEL = settings.WEBSOCKET_COMPRESSION_LEVEL
+_WEBSOCKET_COMPRESSION_WINDOW_BITS = settings.WEBSOCKET_COMPRESSION_WINDOW_BITS
+_WEBSOCKET_COMPRESSION_MEM_LEVEL = settings.WEBSOCKET_COMPRESSION_MEM_LEVEL
+_AJAX_BATCH_DELAY = settings.AJAX_BATCH_DELAY
+_RE_SCREENREADER_REGEX = re.compile(
+    r"%s" % settings.SCREENREADER_REGEX_STRIP, re.DOTALL + re.MULTILINE)
+
+# [bytes before compression, bytes after compression] by protocol
+COMPRESSION_STATS = {"telnet": [0, 0], "websocket": [0, 0]}
+
+# if the missing support for the deflate level has been logged
+_DEFLATE_LEVEL_WARNED = [False]
+
+
+class MccpStream:
+    """
+    The compressor of one telnet connection's MCCP stream. It is used in
+    place of the `zlib.compressobj` Evennia's MCCP code would create, and
+    counts what goes through it.
+
+    """
+
+    __slots__ = ("compressor",)
+
+    def __init__(self):
+        self.compressor = zlib.compressobj(_MCCP_COMPRESSION_LEVEL)
+
+    def compress(self, data):
+        data_out = self.compressor.compress(data)
+        stats = COMPRESSION_STATS["telnet"]
+        stats[0] += len(data)
+        stats[1] += len(data_out)
+        return data_out
+
+    def flush(self, mode=zlib.Z_FINISH):
+        data_out = self.compressor.flush(mode)
+        COMPRESSION_STATS["telnet"][1] += len(data_out)
+        return data_out
+
+
+class OutputBatchMixin:
+    """
+    Mixin for Portal protocols that receive the output batched by
+    `server.conf.serversession.ServerSession` as one `output_batch`
+    message, holding the cleaned output of each `data_out` call it was
+    made from. The calls are sent on in order, as if each had come in
+    on its own.
+
+    """
+
+    def send_output_batch(self, *entries, **kwargs):
+        for entry in entries:
+            self.data_out(**entry)
+
+
+class TelnetProtocol(OutputBatchMixin, BaseTelnetProtocol):
+    """
+    Telnet protocol compressing its output with `MccpStream`.
+
+    """
+
+    _mccp_stream = None
+
+    # Evennia's MCCP handler sets `zlib` to a new compressor when the
+    # client agrees to MCCP and deletes it when MCCP is turned off, and
+    # only compresses output while it exists.
+    @property
+    def zlib(self):
+        if self._mccp_stream is None:
+            raise AttributeError("zlib")
+        return self._mccp_stream
+
+    @zlib.setter
+    def zlib(self, compressor):
+        self._mccp_stream = MccpStream()
+
+    @zlib.deleter
+    def zlib(self):
+        self._mccp_stream = None
+
+
+def _accept_deflate(offers):
+    """
+    Accept the first permessage-deflate offer of a websocket client.
+
+    Args:
+        offers (list): The compression offers made by the client.
+
+    Returns:
+        accept (PerMessageDeflateOfferAccept or None): The accepted offer.
+
+    """
+    for offer in offers:
+        if isinstance(offer, PerMessageDeflateOffer):
+            window_bits = _WEBSOCKET_COMPRESSION_WINDOW_BITS
+            if offer.request_max_window_bits:
+                window_bits = min(window_bits, offer.request_max_window_bits)
+            return PerMessageDeflateOfferAccept(
+                offer, window_bits=window_bits, mem_level=_WEBSOCKET_COMPRESSION_MEM_LEVEL)
+    return None
+
+
+def _set_deflate_level(deflate):
+    """
+    Create the compressor of a permessage-deflate extension at the
+    configured level. Autobahn creates one at zlib's default level for
+    the first message, unless one exists already. Unless the client
+    asked for no context takeover, it is then used for the whole
+    connection.
+
+    This relies on autobahn's private `_compressor` attribute, and does
+    nothing if the installed autobahn does not have it.
+
+    Args:
+        deflate (PerMessageDeflate): The extension of one connection.
+
+    """
+    if not hasattr(deflate, "_compressor"):
+        if not _DEFLATE_LEVEL_WARNED[0]:
+            _DEFLATE_LEVEL_WARNED[0] = True
+            logger.log_warn("This autobahn version does not allow setting the "
+                            "websocket compression level, its default is used.")
+        return
+    if deflate._compressor is None:
+        deflate._compressor = zlib.compressobj(
+            _WEBSOCKET_COMPRESSION_LEVEL,
+            zlib.DEFLATED,
+            -deflate.server_max_window_bits,
+            deflate.mem_level,
+        )
+
+
+class WebSocketClient(OutputBatchMixin, BaseWebSocketClient):
+    """
+    Websocket protocol accepting permessage-deflate compression and
+    msgpack framing.
+
+    """
+
+    def _connectionMade(self):
+        super()._connectionMade()
+        if _WEBSOCKET_COMPRESSION:
+            self.perMessageCompressionAccept = _accept_deflate
+
+    def onOpen(self):
+        deflate = getattr(self, "_perMessageCompress", None)
+        if deflate is not None:
+            _set_deflate_level(deflate)
+        super().onOpen()
+
+    def sendMessage(self, payload, *args, **kwargs):
+        traffic = self.trafficStats
+        app_before = traffic.outgoingOctetsAppLevel
+        wire_before = traffic.outgoingOctetsWebSocketLevel
+        super().sendMessage(payload, *args, **kwargs)
+        stats = COMPRESSION_STATS["websocket"]
+        stats[0] += traffic.outgoingOctetsAppLevel - app_before
+        stats[1] += traffic.outgoingOctetsWebSocketLevel - wire_before
+
+    def onMessage(self, payload, isBinary):
+        if not isBinary:
+            super().onMessage(payload, isBinary)
+            return
+        if msgpack is None:
+            return
+        # frames come straight from the client, so bad ones are dropped
+        try:
+            cmdarray = msgpack.unpackb(payload, raw=False)
+            if not cmdarray:
+                return
+            cmdname, args, kwargs = cmdarray[0], cmdarray[1], cmdarray[2]
+            if not (isinstance(cmdname, str) and isinstance(args, (list, tuple))
+                    and isinstance(kwargs, dict)):
+                raise TypeError("expected [cmdname, args, kwargs]")
+        except (msgpack.UnpackException, ValueError, TypeError, IndexError, KeyError) as err:
+            logger.log_err("Dropped a bad msgpack frame from {0}: {1}".format(
+                self.address, err))
+            return
+        self.data_in(**{cmdname: [args, kwargs]})
+
+    @property
+    def binary_framing(self):
+        return msgpack is not None and self.protocol_flags.get("FRAMING") == "msgpack"
+
+    def send_frame(self, cmdarray):
+        """
+        Send a `[cmdname, args, kwargs]` message to the client in the
+        framing it asked for.
+
+        Args:
+            cmdarray (list): The message.
+
+        """
+        try:
+            if self.binary_framing:
+                self.sendMessage(msgpack.packb(cmdarray, use_bin_type=True), isBinary=True)
+            else:
+                self.sendMessage(json.dumps(cmdarray).encode())
+        except Disconnected:
+            # this can happen on an unclean close of certain browsers.
+            # it means this link is actually already closed.
+            self.disconnect(reason="Browser already closed.")
+
+    def send_text(self, *args, **kwargs):
+        if not self.binary_framing:
+            super().send_text(*args, **kwargs)
+            return
+
+        # as Evennia's send_text, but the message is framed without
+        # being serialized to JSON first
+        if args:
+            args = list(args)
+            text = args[0]
+            if text is None:
+                return
+        else:
+            return
+
+        flags = self.protocol_flags
+        options = kwargs.pop("options", {})
+        raw = options.get("raw", flags.get("RAW", False))
+        client_raw = options.get("client_raw", False)
+        nocolor = options.get("nocolor", flags.get("NOCOLOR", False))
+        screenreader = options.get("screenreader", flags.get("SCREENREADER", False))
+        prompt = options.get("send_prompt", False)
+
+        if screenreader:
+            # screenreader mode cleans up output
+            text = parse_ansi(text, strip_ansi=True, xterm256=False, mxp=False)
+            text = _RE_SCREENREADER_REGEX.sub("", text)
+        cmd = "prompt" if prompt else "text"
+        if raw:
+            if client_raw:
+                args[0] = text
+            else:
+                args[0] = html.escape(text)
+        else:
+            args[0] = parse_html(text, strip_ansi=nocolor)
+
+        self.send_frame([cmd, args, kwargs])
+
+    def send_default(self, cmdname, *args, **kwargs):
+        if not cmdname == "options":
+            self.send_frame([cmdname, args, kwargs])
+
+
+class BatchedAjaxWebClient(AjaxWebClient):
+    """
+    AJAX/COMET long-polling transport that batches messages.
+
+    Clients that set `batch` when they connect get `batch` set in the
+    reply. They then poll with the `poll` mode, and get a JSON list of
+    every message queued for them. When a poll is
+    waiting for output, the reply is held back `settings.AJAX_BATCH_DELAY`
+    seconds after the first message so that the messages following it
+    are sent along. Such clients send their input with the `input_batch`
+    mode, as a JSON list of messages.
+
+    Clients that don't set `batch` are served as by Evennia's own
+    AjaxWebClient.
+
+    """
+
+    def __init__(self):
+        super().__init__()
+        # csessids of batching clients
+        self.batch_clients = set()
+        # unsent messages of batching clients, by csessid
+        self.batches = {}
+        # scheduled replies to waiting polls, by csessid
+        self.replies = {}
+
+    def lineSend(self, csessid, data):
+        if csessid not in self.batch_clients:
+            super().lineSend(csessid, data)
+            return
+
+        self.batches.setdefault(csessid, []).append(data)
+        if csessid in self.requests and csessid not in self.replies:
+            self.replies[csessid] = reactor.callLater(_AJAX_BATCH_DELAY, self.send_batch, csessid)
+
+    def send_batch(self, csessid):
+        """
+        Reply to the waiting poll of a batching client with all messages
+        queued for it.
+
+        Args:
+            csessid (str): The client session id.
+
+        """
+        reply = self.replies.pop(csessid, None)
+        if reply is not None and reply.active():
+            reply.cancel()
+        request = self.requests.pop(csessid, None)
+        if request is None:
+            return
+        request.write(jsonify(self.batches.pop(csessid, [])))
+        request.finish()
+
+    def client_disconnect(self, csessid):
+        if csessid in self.batch_clients:
+            # send any last messages, such as the reason for the disconnect
+            self.send_batch(csessid)
+            self.batch_clients.discard(csessid)
+            self.batches.pop(csessid, None)
+        super().client_disconnect(csessid)
+
+    def mode_init(self, request):
+        if not request.args.get(b"batch"):
+            return super().mode_init(request)
+        self.batch_clients.add(self.get_client_sessid(request))
+        # tell the client it can use the batching modes
+        reply = json.loads(super().mode_init(request))
+        reply["batch"] = True
+        return jsonify(reply)
+
+    def mode_input_batch(self, request):
+        """
+        This is called by render_POST when a batching client sends a list
+        of messages to the server.
+
+        Args:
+            request (Request): Incoming request.
+
+        """
+        csessid = self.get_client_sessid(request)
+        self.last_alive[csessid] = (time.time(), False)
+        cmdarrays = json.loads(request.args.get(b"data")[0])
+        sessions = self.sessionhandler.sessions_from_csessid(csessid)
+        for cmdarray in cmdarrays:
+            for sess in sessions:
+                sess.data_in(**{cmdarray[0]: [cmdarray[1], cmdarray[2]]})
+        return b'""'
+
+    def mode_poll(self, request):
+        """
+        This is called by render_POST when a batching client is ready to
+        receive data. Queued messages are returned right away, otherwise
+        the request waits for output.
+
+        Args:
+            request (Request): Incoming request.
+
+        """
+        csessid = self.get_client_sessid(request)
+        self.last_alive[csessid] = (time.time(), False)
+
+        batch = self.batches.pop(csessid, None)
+        if batch:
+            return jsonify(batch)
+
+        request.notifyFinish().addErrback(self._responseFailed, csessid, request)
+        if csessid in self.requests:
+            self.requests[csessid].finish()  # Clear any stale request.
+        self.requests[csessid] = request
+        return server.NOT_DONE_YET
+
+    def render_POST(self, request):
+        dmode = request.args.get(b"mode", [b"None"])[0].decode("utf-8")
+        if dmode == "poll":
+            return self.mode_poll(request)
+        elif dmode == "input_batch":
+            return self.mode_input_batch(request)
+        return super().render_POST(request)
@@ -12,7 +12,30 @@ your services can be added to it). The function should not return
 anything. Plugin services are started last in the Portal startup
 process.
 
+Here, a service regularly logs how much the telnet and websocket output
+compression of `server.conf.portal_protocols` saves.
+
 """
+from django.conf import settings
+from twisted.application.internet import TimerService
+
+from evennia.utils import logger
+
+from server.conf.portal_protocols import COMPRESSION_STATS
+
+_COMPRESSION_STATS_INTERVAL = settings.COMPRESSION_STATS_INTERVAL
+
+
+def log_compression_stats():
+    """
+    Log the bytes saved by output compression so far, per protocol.
+
+    """
+    for protocol, (raw, sent) in sorted(COMPRESSION_STATS.items()):
+        if raw:
+            logger.log_info(
+                "Compression ({0}): {1} bytes sent for {2}, {3} bytes ({4:.1f}%) saved.".format(
+                    protocol, sent, raw, raw - sent, 100.0 * (raw - sent) / raw))
 
 
 def start_plugin_services(portal):
@@ -21,4 +44,7 @@ def start_plugin_services(portal):
 
     portal - a reference to the main portal application.
     """
-    pass
+    if _COMPRESSION_STATS_INTERVAL > 0:
+        stats_service = TimerService(_COMPRESSION_STATS_INTERVAL, log_compression_stats)
+        stats_service.setName("CompressionStats")
+        portal.services.addService(stats_service)
@@ -13,16 +13,66 @@ necessary except for the most custom and exotic designs - and even
 then it might be enough to just add custom session-level commands to
 the SessionCmdSet instead.
 
-This module is not normally called. To tell Evennia to use the class
-in this module instead of the default one, add the following to your
-settings file:
+This module is used through the following line in the settings file:
 
     SERVER_SESSION_CLASS = "server.conf.serversession.ServerSession"
 
+The ServerSession here batches output. Everything sent to a session while
+a command runs is collected in the order it was sent, with consecutive
+text messages with the same options joined into one, and sent to the
+Portal once the reactor gets control back: a flush is scheduled with
+`callLater` as soon as the first message of a batch arrives. While a
+command keeps the reactor busy that flush cannot run, so the batch is
+also sent as soon as more output arrives once it holds more than
+`settings.SESSION_OUTPUT_MAX_SIZE` characters of text, or its oldest
+message has waited `settings.SESSION_OUTPUT_MAX_LATENCY` seconds.
+Batching is turned off by setting `SESSION_OUTPUT_BATCHING` to False.
+
+A batch is sent to the Portal as one AMP message, holding the output of
+each call in its own `output_batch` entry, which the Portal protocols
+in `server/conf/portal_protocols.py` unpack again (see
+`OutputBatchMixin`). Sessions of other protocols get one AMP message
+per entry.
+
 """
+import time
+
+from django.conf import settings
+from twisted.internet import reactor
 
 from evennia.server.serversession import ServerSession as BaseServerSession
 
+_OUTPUT_BATCHING = settings.SESSION_OUTPUT_BATCHING
+_OUTPUT_MAX_SIZE = settings.SESSION_OUTPUT_MAX_SIZE
+_OUTPUT_MAX_LATENCY = settings.SESSION_OUTPUT_MAX_LATENCY
+
+# protocols whose Portal classes unpack `output_batch` messages
+_OUTPUT_BATCH_PROTOCOLS = ("telnet", "webclient/websocket")
+
+
+def _split_text(value):
+    """
+    Split the value of a `text` output into the text and its options, if
+    it has a form that can be joined with other text.
+
+    Args:
+        value (any): The `text` keyword given to `data_out`.
+
+    Returns:
+        split (tuple or None): `(text, options)`, or None if the value
+            should be sent as it is.
+
+    """
+    if isinstance(value, str):
+        return value, {}
+    if isinstance(value, (tuple, list)) and len(value) == 2 and isinstance(value[1], dict):
+        text = value[0]
+        if isinstance(text, (tuple, list)) and len(text) == 1:
+            text = text[0]
+        if isinstance(text, str):
+            return text, value[1]
+    return None
+
 
 class ServerSession(BaseServerSession):
     """
@@ -34,4 +84,100 @@ class ServerSession(BaseServerSession):
     through their session(s).
     """
 
-    pass
+    # output waiting to be sent, as `[kwargs, options]` of `data_out`
+    # calls in the order they were made
+    _output_batch = None
+    _output_size = 0
+    _output_started = 0.0
+    _output_flush = None
+
+    def data_out(self, **kwargs):
+        """
+        Send data to the Portal, batched with other output sent during
+        the same reactor turn.
+
+        Keyword Args:
+            kwargs (any): Each key is a command instruction to the
+                protocol on the form `key=((args), {kwargs})`.
+
+        """
+        if not _OUTPUT_BATCHING:
+            super().data_out(**kwargs)
+            return
+
+        options = kwargs.pop("options", None)
+        batch = self._output_batch
+        if batch is None:
+            batch = self._output_batch = []
+            self._output_size = 0
+            self._output_started = time.time()
+            self._output_flush = reactor.callLater(0, self.flush_output)
+
+        text = _split_text(kwargs["text"]) if "text" in kwargs else None
+        if text is not None:
+            self._output_size += len(text[0])
+        if not (batch and self._join_text(batch[-1], kwargs, options)):
+            batch.append([kwargs, options])
+
+        if (self._output_size >= _OUTPUT_MAX_SIZE
+                or time.time() - self._output_started >= _OUTPUT_MAX_LATENCY):
+            self.flush_output()
+
+    @staticmethod
+    def _join_text(last, kwargs, options):
+        """
+        Join text output to the batched output before it, if both are
+        only text with the same options.
+
+        Args:
+            last (list): The last `[kwargs, options]` in the batch.
+            kwargs (dict): The new output, as given to `data_out`.
+            options (dict or None): The new output's options.
+
+        Returns:
+            joined (bool): If the text was joined to `last`.
+
+        """
+        last_kwargs, last_options = last
+        if last_options != options or list(last_kwargs) != ["text"] or list(kwargs) != ["text"]:
+            return False
+        old, new = _split_text(last_kwargs["text"]), _split_text(kwargs["text"])
+        if old is None or new is None or old[1] != new[1]:
+            return False
+        last_kwargs["text"] = ("{0}\n{1}".format(old[0], new[0]), new[1])
+        return True
+
+    def flush_output(self):
+        """
+        Send the batched output to the Portal right away.
+
+        """
+        batch = self._output_batch
+        if batch is None:
+            return
+        flush = self._output_flush
+        if flush is not None and flush.active():
+            flush.cancel()
+        self._output_batch = self._output_flush = None
+        self._output_size = 0
+
+        if self.sessid not in self.sessionhandler:
+            # disconnected while the output was waiting
+            return
+        for kwargs, options in batch:
+            if options is not None:
+                kwargs["options"] = options
+        if len(batch) == 1 or self.protocol_key not in _OUTPUT_BATCH_PROTOCOLS:
+            for kwargs, _ in batch:
+                super().data_out(**kwargs)
+            return
+
+        # as the sessionhandler's data_out, but with every call cleaned on
+        # its own and all of them sent in one AMP message
+        handler = self.sessionhandler
+        entries = [handler.clean_senddata(self, kwargs) for kwargs, _ in batch]
+        handler.server.amp_protocol.send_MsgServer2Portal(self, output_batch=[entries, {}])
+
+    def at_disconnect(self, reason=None):
+        self.flush_output()
+        super().at_disconnect(reason=reason)
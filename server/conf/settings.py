@@ -34,6 +34,90 @@ from evennia.settings_default import *
 # This is the name of your game. Make it catchy!
 SERVERNAME = "frankmud"
 
+# Use the trie-based command parser
+COMMAND_PARSER = "server.conf.cmdparser.cmdparser"
+
+# Handling of object search results
+SEARCH_AT_RESULT = "server.conf.at_search.at_search_result"
+
+# Base class of all commands, adding per-command timing
+COMMAND_DEFAULT_CLASS = "commands.command.MuxCommand"
+
+# Server session class, batching output to the Portal
+SERVER_SESSION_CLASS = "server.conf.serversession.ServerSession"
+
+# Portal protocols, compressing telnet and websocket output
+TELNET_PROTOCOL_CLASS = "server.conf.portal_protocols.TelnetProtocol"
+WEBSOCKET_PROTOCOL_CLASS = "server.conf.portal_protocols.WebSocketClient"
+
+######################################################################
+# Game performance settings
+######################################################################
+
+# Rooms with more visible things than this summarize them instead of
+# listing every one of them when looked at.
+ROOM_SUMMARY_THRESHOLD = 50
+ROOM_SUMMARY_STRING = "a great many items"
+
+# Seconds during which broadcasts in a room, such as characters sitting
+# down or doors opening, are collected and sent to each object in the
+# room as one combined message. 0 sends every broadcast right away.
+ROOM_BROADCAST_TICK = 0.1
+
+# Lowest similarity (0-1) a name must have to match a fuzzy search that
+# found nothing otherwise, such as "wear hlemet" for a helmet. 1 turns
+# this off.
+SEARCH_FUZZY_THRESHOLD = 0.5
+
+# Most objects the bulkspawn command creates at once.
+BULK_SPAWN_MAX_COUNT = 1000
+
+# Seconds Attribute changes made through the write-behind buffer, such as
+# positions, worn items and door states, wait before being saved in one
+# transaction. 0 saves every change right away.
+WRITE_BEHIND_INTERVAL = 1.0
+
+# Objects converted per transaction by the migrate command, the most
+# seconds one such chunk may keep the server busy before it is committed
+# early, and seconds the server goes back to other work between chunks.
+MIGRATION_CHUNK_SIZE = 100
+MIGRATION_CHUNK_TIME = 0.1
+MIGRATION_CHUNK_DELAY = 0.5
+
+# Commands taking longer than this many milliseconds are logged.
+COMMAND_SLOW_LOG_THRESHOLD = 100
+
+# Output sent to a session during one reactor turn is sent to the Portal
+# as one message (for telnet and websocket sessions, others get one
+# message per output call). A batch is sent early once it holds more than
+# SESSION_OUTPUT_MAX_SIZE characters of text or its oldest message has
+# waited SESSION_OUTPUT_MAX_LATENCY seconds.
+SESSION_OUTPUT_BATCHING = True
+SESSION_OUTPUT_MAX_SIZE = 16384
+SESSION_OUTPUT_MAX_LATENCY = 0.05
+
+# zlib levels (1-9) of MCCP telnet compression and of permessage-deflate
+# websocket compression. Websocket compression can be turned off. Its
+# window size (8-15 bits) and memory level (1-9) set how much memory each
+# connection's compressor uses.
+MCCP_COMPRESSION_LEVEL = 6
+WEBSOCKET_COMPRESSION = True
+WEBSOCKET_COMPRESSION_LEVEL = 6
+WEBSOCKET_COMPRESSION_WINDOW_BITS = 15
+WEBSOCKET_COMPRESSION_MEM_LEVEL = 8
+
+# Let webclients that ask for it use msgpack binary websocket frames
+# instead of JSON. Needs the msgpack package.
+WEBCLIENT_BINARY_FRAMING = True
+
+# Seconds a waiting AJAX webclient poll is held back after the first new
+# message, so that the messages right after it are sent in the same reply.
+AJAX_BATCH_DELAY = 0.02
+
+# Seconds between log entries of the bytes saved by compression. 0 turns
+# the log off.
+COMPRESSION_STATS_INTERVAL = 3600
+
 ######################################################################
 # Settings given in secret_settings.py override those in this file.
 ######################################################################
@@ -38,4 +38,12 @@ def at_webproxy_root_creation(web_root):
             primarily for new protocol development, but suitable
             for other shenanigans.
     """
+    if b"webclientdata" in web_root.children:
+        # serve the AJAX webclient with the batching transport
+        from evennia.server.portal.portalsessionhandler import PORTAL_SESSIONS
+        from server.conf.portal_protocols import BatchedAjaxWebClient
+
+        ajax_webclient = BatchedAjaxWebClient()
+        ajax_webclient.sessionhandler = PORTAL_SESSIONS
+        web_root.putChild(b"webclientdata", ajax_webclient)
     return web_root
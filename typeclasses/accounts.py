@@ -24,6 +24,8 @@ several more options for customizing the Guest account system.
 
 from evennia import DefaultAccount, DefaultGuest
 
+from commands.merging import forget_merges
+
 
 class Account(DefaultAccount):
     """
@@ -92,10 +94,19 @@ class Account(DefaultAccount):
 
     """
 
-    pass
+    def at_idmapper_flush(self):
+        flushed = super().at_idmapper_flush()
+        if flushed:
+            # cached cmdset merges refer to this instance
+            forget_merges(self)
+        return flushed
+
+    def delete(self, *args, **kwargs):
+        forget_merges(self)
+        return super().delete(*args, **kwargs)
 
 
-class Guest(DefaultGuest):
+class Guest(Account, DefaultGuest):
     """
     This class is used for guest logins. Unlike Accounts, Guests and their
     characters are deleted after disconnection.
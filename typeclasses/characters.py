@@ -8,12 +8,16 @@ creation commands.
 
 """
 import enum
-from typing import Dict, Optional
+from typing import List, Optional
 
 from evennia import DefaultCharacter
+from evennia.utils.utils import lazy_property
 from typeclasses.objects import CustomObject
+from world.enumcodec import register
+from world.equipment import EquipmentHandler
 
 
+@register("position")
 class PhysicalPosition(enum.Enum):
     standing = 0
     kneeling = 1
@@ -21,6 +25,7 @@ class PhysicalPosition(enum.Enum):
     lying = 3
 
 
+@register("hand")
 class Hand(enum.Enum):
     left = 0
     right = 1
@@ -49,37 +54,46 @@ class Character(DefaultCharacter, CustomObject):
     equipable_body_parts = ["head", "face", "neck", "right_arm", "left_arm",
                             "right_hand", "left_hand", "torso", "waist", "right_leg", "left_leg", "right_foot", "left_foot"]
 
+    @lazy_property
+    def equipment(self) -> EquipmentHandler:
+        return EquipmentHandler(self)
+
     def at_before_move(self, destination, **kwargs):
-        if self.db.physical_position != PhysicalPosition.standing:
+        if self.enums.get("physical_position") != PhysicalPosition.standing:
             self.msg("You must be standing to move.")
             return False
 
         return super().at_before_move(destination, **kwargs)
 
+    def at_post_puppet(self, **kwargs):
+        super().at_post_puppet(**kwargs)
+
+        if self.location:
+            self.location.at_content_change(self)
+
+    def at_post_unpuppet(self, account, session=None, **kwargs):
+        location = self.location
+        super().at_post_unpuppet(account, session=session, **kwargs)
+
+        if location:
+            location.at_content_change(self)
+
     def at_object_creation(self):
         super().at_object_creation()
 
-        if not self.db.dominant_hand:
-            self.db.dominant_hand: Hand = Hand.right
-
-        if not self.db.equipment:
-            self.db.equipment: Dict = {}
-            for part in self.equipable_body_parts:
-                self.db.equipment[part] = None
+        if not self.enums.get("dominant_hand"):
+            self.enums.add("dominant_hand", Hand.right)
 
-        if not self.db.inventory:
-            self.db.inventory: Dict = {}
-            self.db.inventory[Hand.left] = None
-            self.db.inventory[Hand.right] = None
+        self.equipment.initialize()
 
-        if not self.db.physical_position:
-            self.db.physical_position: PhysicalPosition = PhysicalPosition.standing
+        if not self.enums.get("physical_position"):
+            self.enums.add("physical_position", PhysicalPosition.standing)
 
     def at_before_change_position(self, to_position: PhysicalPosition):
-        return self.db.physical_position != to_position
+        return self.enums.get("physical_position") != to_position
 
     def at_change_position(self, to_position: PhysicalPosition):
-        self.db.physical_position = to_position
+        self.enums.add("physical_position", to_position)
 
         self_msg = "You {0}."
         others_msg = "{0} {1}."
@@ -101,13 +115,13 @@ class Character(DefaultCharacter, CustomObject):
             others_position_string = "lies down"
 
         self.msg(self_msg.format(self_position_string))
-        self.location.msg_contents(
+        self.location.broadcast(
             others_msg.format(self.name, others_position_string).capitalize(),
             exclude=[self]
         )
 
     def at_failed_change_position(self, to_position: PhysicalPosition):
-        if self.db.physical_position == to_position:
+        if self.enums.get("physical_position") == to_position:
             msg = "You are already {0}."
             position_string = ""
             if to_position == PhysicalPosition.standing:
@@ -122,33 +136,32 @@ class Character(DefaultCharacter, CustomObject):
             self.msg(msg.format(position_string))
 
     def get_equipment_display(self) -> str:
-        output = ""
-        for part in self.equipable_body_parts:
-            part_for_display = part.replace("_", " ").capitalize()
-            equipment_name = self.db.equipment[part].name if self.db.equipment[part] is not None else "Nothing"
-            output += "{0}: {1}\n".format(part_for_display, equipment_name)
+        return self.equipment.get_display()
 
-        return output
+    def get_equipment_data(self) -> List[List[str]]:
+        return self.equipment.get_display_data()
 
     def get_nondominant_hand(self) -> Hand:
-        return Hand.left if self.db.dominant_hand == Hand.right else Hand.right
+        return Hand.left if self.enums.get("dominant_hand") == Hand.right else Hand.right
 
     def get_free_hand(self) -> Optional[Hand]:
-        other_hand = self.get_nondominant_hand()
+        dominant_hand = self.enums.get("dominant_hand")
+        other_hand = Hand.left if dominant_hand == Hand.right else Hand.right
 
-        if self.db.inventory[self.db.dominant_hand] is None:
-            return self.db.dominant_hand
-        elif self.db.inventory[other_hand] is None:
+        if self.equipment.get_held(dominant_hand) is None:
+            return dominant_hand
+        elif self.equipment.get_held(other_hand) is None:
             return other_hand
         else:
             return None
 
     def get_containing_hand(self, obj_to_search) -> Optional[Hand]:
-        other_hand = self.get_nondominant_hand()
+        dominant_hand = self.enums.get("dominant_hand")
+        other_hand = Hand.left if dominant_hand == Hand.right else Hand.right
 
-        if self.db.inventory[self.db.dominant_hand] is obj_to_search:
-            return self.db.dominant_hand
-        elif self.db.inventory[other_hand] is obj_to_search:
+        if self.equipment.get_held(dominant_hand) is obj_to_search:
+            return dominant_hand
+        elif self.equipment.get_held(other_hand) is obj_to_search:
             return other_hand
         else:
             return None
@@ -7,6 +7,7 @@ for allowing Characters to traverse the exit to its destination.
 
 """
 import enum
+from typing import Optional
 
 from django.conf import settings
 
@@ -14,17 +15,38 @@ from evennia import DefaultExit
 from evennia.utils.utils import class_from_module
 
 from typeclasses.objects import CustomObject
+from world.enumcodec import register
 
 
 _COMMAND_DEFAULT_CLASS = class_from_module(settings.COMMAND_DEFAULT_CLASS)
 
 
+@register("door")
 class DoorState(enum.Enum):
     open = 0
     closed = 1
     locked = 2
 
 
+class DoorRecord:
+    """
+    The state shared by the two sides of a paired door. Both Doors use
+    the same record in memory. It is stored as the `door_state` Attribute
+    of both sides, but only read from the one with the lowest id, called
+    the owner.
+    """
+
+    __slots__ = ("owner", "state")
+
+    def __init__(self, owner, state):
+        self.owner = owner
+        self.state = state
+
+
+# door records by the id of their owning door
+_DOOR_RECORDS = {}
+
+
 class Exit(DefaultExit, CustomObject):
     """
     Exits are connectors between rooms. Exits are normal Objects except
@@ -49,8 +71,52 @@ class Exit(DefaultExit, CustomObject):
         at_failed_traverse(traveller) - called by at_traverse if traversal failed for some reason. Will
                                         not be called if the attribute `err_traverse` is
                                         defined, in which case that will simply be echoed.
+
+    Exits inside a Room do not carry a cmdset of their own. Instead each exit
+    builds its traversal command once and keeps it, and the Room collects the
+    commands of all its exits into a single merged exit cmdset (see
+    `Room.create_exit_cmdset`). This keeps the number of cmdsets merged per
+    command the same no matter how many exits a room has.
     """
-    pass
+
+    def get_exit_command(self):
+        """
+        Get the command used to traverse this exit, building it on first use.
+
+        Returns:
+            command (Command): The traversal command of this exit.
+        """
+        command = self.ndb._exit_command
+        if command is None:
+            command = self.exit_command(
+                key=self.db_key.strip().lower(),
+                aliases=self.aliases.all(),
+                locks=str(self.locks),
+                auto_help=False,
+                destination=self.db_destination,
+                arg_regex=r"^$",
+                is_exit=True,
+                obj=self,
+            )
+            self.ndb._exit_command = command
+        return command
+
+    def at_rename(self, oldname, newname):
+        # the traversal command is keyed on the name
+        self.ndb._exit_command = None
+        super().at_rename(oldname, newname)
+
+    def at_cmdset_get(self, **kwargs):
+        location = self.location
+        if not hasattr(location, "reset_exit_cmdset"):
+            # not in a Room that pools exit commands
+            super().at_cmdset_get(**kwargs)
+            return
+
+        if "force_init" in kwargs:
+            self.ndb._exit_command = None
+            location.name_index.update(self)
+            location.at_content_change(self)
 
 
 class DoorCommand(_COMMAND_DEFAULT_CLASS):
@@ -67,7 +133,7 @@ class DoorCommand(_COMMAND_DEFAULT_CLASS):
         """
         door: Door = self.obj
 
-        if door.db.door_state != DoorState.open:
+        if door.door_state != DoorState.open:
             door.at_failed_traverse(self.caller)
             return
 
@@ -102,14 +168,95 @@ class DoorCommand(_COMMAND_DEFAULT_CLASS):
 
 
 class Door(Exit):
+    """
+    A pair of Exits that can be opened, closed and locked together. The
+    two sides point to each other through `db.pair`, which should be set
+    with `set_pair` so the other side is paired back and gets the same
+    state, and share a single `DoorRecord` holding their state. The id
+    of the pair is kept in memory once read, so reading the state does
+    not read `db.pair`.
+    """
     exit_command = DoorCommand
 
     def at_object_creation(self):
-        self.db.door_state = DoorState.closed
+        self.enums.add("door_state", DoorState.closed)
         self.db.pair: Door = None
 
+    def at_object_delete(self):
+        if not super().at_object_delete():
+            return False
+
+        self.set_pair(None)
+        return True
+
+    @property
+    def pair(self) -> Optional["Door"]:
+        # the id of the pair is kept in memory, 0 if there is none, so
+        # db.pair is only read the first time
+        pair_id = self.ndb._pair_id
+        if pair_id is not None:
+            if not pair_id:
+                return None
+            pair = Door.get_cached_instance(pair_id)
+            if pair is not None:
+                return pair
+
+        pair = self.db.pair
+        self.ndb._pair_id = pair.id if pair else 0
+        return pair
+
+    def set_pair(self, other: Optional["Door"]):
+        """
+        Pair this door with another one, or unpair it by passing `None`.
+        The other door is paired back with this one. The state of the
+        door with the lowest id becomes the shared state.
+        """
+        old_pair = self.pair
+        for door in (self, old_pair, other):
+            if door:
+                _DOOR_RECORDS.pop(door.id, None)
+
+        if old_pair and old_pair != other:
+            old_pair.db.pair = None
+            old_pair.ndb._pair_id = 0
+
+        self.db.pair = other
+        self.ndb._pair_id = other.id if other else 0
+        if other:
+            other.db.pair = self
+            other.ndb._pair_id = self.id
+            record = self.door_record
+            for door in (self, other):
+                if door != record.owner:
+                    door.enums.add("door_state", record.state)
+
+    @property
+    def door_record(self) -> DoorRecord:
+        pair = self.pair
+        owner = pair if pair and pair.id < self.id else self
+        record = _DOOR_RECORDS.get(owner.id)
+        if record is None:
+            record = DoorRecord(owner, owner.enums.get(
+                "door_state", default=DoorState.closed))
+            _DOOR_RECORDS[owner.id] = record
+        return record
+
+    @property
+    def door_state(self) -> DoorState:
+        return self.door_record.state
+
+    @door_state.setter
+    def door_state(self, state: DoorState):
+        record = self.door_record
+        if record.state != state:
+            record.state = state
+            self.enums.add("door_state", state)
+            pair = self.pair
+            if pair:
+                pair.enums.add("door_state", state)
+
     def at_failed_traverse(self, traversing_object, **kwargs):
-        if self.db.door_state != DoorState.open:
+        if self.door_state != DoorState.open:
             traversing_object.msg(
                 "{0} is closed.".format(self.name).capitalize())
             return
@@ -117,47 +264,53 @@ class Door(Exit):
         super().at_failed_traverse(traversing_object, **kwargs)
 
     def at_before_open(self, opener):
-        return self.db.door_state == DoorState.closed
+        return self.door_state == DoorState.closed
 
     def at_before_close(self, closer):
-        return self.db.door_state == DoorState.open
+        return self.door_state == DoorState.open
 
     def at_open(self, opener):
-        self.db.door_state = DoorState.open
-        self.db.pair.db.door_state = DoorState.open
+        self.door_state = DoorState.open
 
         opener.msg("You open {0}.".format(self.name))
-        self.location.msg_contents(
+        self.location.broadcast(
             "{0} opens {1}.".format(opener.name, self.name).capitalize(),
             exclude=[opener]
         )
+        self.location.at_content_change()
 
-        self.db.pair.location.msg_contents(
-            "{0} opens.".format(self.db.pair.name).capitalize())
+        pair = self.pair
+        if pair:
+            pair.location.broadcast(
+                "{0} opens.".format(pair.name).capitalize())
+            pair.location.at_content_change()
 
     def at_close(self, closer):
-        self.db.door_state = DoorState.closed
-        self.db.pair.db.door_state = DoorState.closed
+        self.door_state = DoorState.closed
 
         closer.msg("You close {0}.".format(self.name))
-        self.location.msg_contents(
+        self.location.broadcast(
             "{0} closes {1}".format(closer.name, self.name).capitalize(),
             exclude=[closer]
         )
+        self.location.at_content_change()
 
-        self.db.pair.location.msg_contents(
-            "{0} closes.".format(self.db.pair.name).capitalize())
+        pair = self.pair
+        if pair:
+            pair.location.broadcast(
+                "{0} closes.".format(pair.name).capitalize())
+            pair.location.at_content_change()
 
     def at_failed_open(self, opener):
-        if self.db.door_state == DoorState.open:
+        if self.door_state == DoorState.open:
             opener.msg("It's already open.")
-        elif self.db.door_state == DoorState.locked:
+        elif self.door_state == DoorState.locked:
             opener.msg("You can't open it, because it's locked.")
         else:
             super().at_failed_open(opener)
 
     def at_failed_close(self, closer):
-        if self.db.door_state in [DoorState.closed, DoorState.locked]:
+        if self.door_state in [DoorState.closed, DoorState.locked]:
             closer.msg("It's already closed.")
         else:
             super().at_failed_close(closer)
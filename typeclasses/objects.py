@@ -10,7 +10,17 @@ the other types, you can do so by adding this as a multiple
 inheritance.
 
 """
+from django.conf import settings
+
 from evennia import DefaultObject
+from evennia.utils.utils import lazy_property, variable_from_module
+from commands.merging import forget_merges
+from server.conf.at_search import search_fuzzy, search_index
+from world.enumcodec import EnumAttributeHandler
+from world.name_index import NameIndexHandler
+from world.writebehind import WriteBehindHandler
+
+_AT_SEARCH_RESULT = variable_from_module(*settings.SEARCH_AT_RESULT.rsplit(".", 1))
 
 
 class CustomObject(DefaultObject):
@@ -159,11 +169,125 @@ class CustomObject(DefaultObject):
 
     """
 
+    @lazy_property
+    def name_index(self):
+        return NameIndexHandler(self)
+
+    @lazy_property
+    def writebehind(self):
+        return WriteBehindHandler(self)
+
+    @lazy_property
+    def enums(self):
+        return EnumAttributeHandler(self)
+
+    def _update_location_indexes(self):
+        """
+        Update the indexes of this object's location after this object
+        was created or renamed. Locations that are not CustomObjects have
+        no indexes.
+        """
+        location = self.location
+        if location and hasattr(location, "name_index"):
+            location.name_index.update(self)
+            location.at_content_change(self)
+
+    def basetype_posthook_setup(self):
+        super().basetype_posthook_setup()
+        self._update_location_indexes()
+
+    def at_object_delete(self):
+        if not super().at_object_delete():
+            return False
+
+        # deleting an object does not call the leave hook of its
+        # location, which keeps the location's indexes current
+        location = self.location
+        if location and hasattr(location, "name_index"):
+            location.at_object_leave(self, None)
+        forget_merges(self)
+        return True
+
+    def at_idmapper_flush(self):
+        # pending writes only hold a weak reference to this object
+        self.writebehind.flush()
+        flushed = super().at_idmapper_flush()
+        if flushed:
+            # cached cmdset merges refer to this instance
+            forget_merges(self)
+        return flushed
+
+    def at_object_receive(self, moved_obj, source_location, **kwargs):
+        super().at_object_receive(moved_obj, source_location, **kwargs)
+        self.name_index.add(moved_obj)
+
+    def at_object_leave(self, moved_obj, target_location, **kwargs):
+        super().at_object_leave(moved_obj, target_location, **kwargs)
+        self.name_index.remove(moved_obj)
+
+    def at_rename(self, oldname, newname):
+        super().at_rename(oldname, newname)
+        self._update_location_indexes()
+
+    def at_cmdset_get(self, **kwargs):
+        if "force_init" in kwargs:
+            # the alias command asks for this after changing aliases
+            self._update_location_indexes()
+        super().at_cmdset_get(**kwargs)
+
+    def search(self, searchdata, global_search=False, use_nicks=True, typeclass=None,
+               location=None, attribute_name=None, quiet=False, exact=False,
+               candidates=None, nofound_string=None, multimatch_string=None,
+               use_dbref=None, fuzzy=False):
+        """
+        Search for objects, see `DefaultObject.search`. A plain search of
+        the objects around this one, which is what most commands do to
+        find their targets, is answered from the `name_index` of this
+        object and of its location rather than from the database, see
+        `server.conf.at_search`. All other searches, and searches the
+        indexes find nothing for, are passed on to `DefaultObject.search`.
+
+        With `fuzzy`, a plain search the indexes find nothing for uses
+        the most similar names instead, before asking the database. This
+        is meant for commands that are harmless if they pick the wrong
+        target, such as `wear`, never for destructive ones.
+
+        """
+        if (global_search or typeclass or location is not None or attribute_name
+                or candidates is not None or not isinstance(searchdata, str)):
+            return super().search(
+                searchdata, global_search=global_search, use_nicks=use_nicks,
+                typeclass=typeclass, location=location, attribute_name=attribute_name,
+                quiet=quiet, exact=exact, candidates=candidates,
+                nofound_string=nofound_string, multimatch_string=multimatch_string,
+                use_dbref=use_dbref)
+
+        if use_nicks:
+            searchdata = self.nicks.nickreplace(
+                searchdata, categories=("object", "account"), include_account=True)
+        results = search_index(self, searchdata, exact=exact)
+        if not results and fuzzy and not exact:
+            results = search_fuzzy(self, searchdata)
+        if not results:
+            results = super().search(
+                searchdata, use_nicks=False, quiet=True, exact=exact, use_dbref=use_dbref)
+
+        if quiet:
+            return results
+        return _AT_SEARCH_RESULT(
+            results, self, query=searchdata,
+            nofound_string=nofound_string, multimatch_string=multimatch_string)
+
+    # Attributes every new object of the class starts with. They are
+    # added by at_object_creation, or inserted along with the prototype's
+    # Attributes by world.bulkspawn.
+    creation_attrs = {"wearable": False, "wearable_location": None}
+
     def at_object_creation(self):
         super().at_object_creation()
 
-        self.db.wearable = False
-        self.db.wearable_location = None
+        if not self.ndb.bulk_spawned:
+            self.attributes.batch_add(*self.creation_attrs.items())
 
     def at_before_open(self, opener):
         """
@@ -199,16 +323,46 @@ class CustomObject(DefaultObject):
         """
         closer.msg("You cannot close this.")
 
+    def at_desc_change(self):
+        """
+        Called after the description of this object has been changed.
+        """
+        pass
 
-class WearableObject(CustomObject):
-    def at_object_creation(self):
-        super().at_object_creation()
+    def at_content_change(self, changed_obj=None):
+        """
+        Called when something that affects how the contents of this object
+        are displayed has changed. Does nothing by default, rooms use it to
+        invalidate their cached appearance.
 
-        self.db.wearable = True
-        self.db.is_worn = False
+        Args:
+            changed_obj (Object, optional): The object in this object's
+                contents whose state changed, if any.
+        """
+        pass
+
+    def broadcast(self, text, exclude=None, instant=False):
+        """
+        Send a message about an event to everything inside this object,
+        like `msg_contents`. Rooms queue these messages and combine them
+        per receiver, see `world.broadcast`. Other objects send them
+        right away.
+
+        Args:
+            text (str): The message to send.
+            exclude (list, optional): Objects that should not receive
+                the message.
+            instant (bool, optional): Send the message right away, after
+                any messages already queued.
+        """
+        self.msg_contents(text, exclude=exclude)
+
+
+class WearableObject(CustomObject):
+    creation_attrs = {"wearable": True, "wearable_location": None, "is_worn": False}
 
     def at_before_drop(self, dropper, **kwargs):
-        if self.db.is_worn:
+        if self.writebehind.get("is_worn"):
             dropper.msg(
                 "You're wearing that. You should remove it before dropping it.")
             return False
@@ -216,7 +370,7 @@ class WearableObject(CustomObject):
         return super().at_before_drop(dropper, **kwargs)
 
     def at_before_give(self, giver, getter, **kwargs):
-        if self.db.is_worn:
+        if self.writebehind.get("is_worn"):
             giver.msg(
                 "You're wearing that. You should remove it before giving it to someone.")
             return False
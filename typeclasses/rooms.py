@@ -5,11 +5,48 @@ Rooms are simple containers that has no location of their own.
 
 """
 
-from collections import defaultdict
+from django.conf import settings
 
-from evennia import DefaultRoom
-from evennia.utils.utils import list_to_string
+from evennia import CmdSet, DefaultRoom
+from evennia.utils.utils import lazy_property, list_to_string
 from typeclasses.objects import CustomObject
+from world.access import filter_access, get_permission_class
+from world.broadcast import BroadcastQueueHandler
+from world.content_index import ContentIndexHandler
+
+_ROOM_SUMMARY_THRESHOLD = settings.ROOM_SUMMARY_THRESHOLD
+_ROOM_SUMMARY_STRING = settings.ROOM_SUMMARY_STRING
+
+
+def group_things(things, looker):
+    """
+    Group objects by display name and render one string per group, such
+    as "a sword" or "three swords". The pluralizer is only called once
+    per group, on its first member.
+
+    Args:
+        things (iterable): The objects to group.
+        looker (Object): The object that will see the result.
+
+    Returns:
+        thing_strings (list): One display string per group, sorted by
+            display name.
+
+    """
+    groups = {}
+    for thing in things:
+        key = thing.get_display_name(looker)
+        group = groups.get(key)
+        if group is None:
+            groups[key] = [thing, 1]
+        else:
+            group[1] += 1
+
+    thing_strings = []
+    for key, (first, count) in sorted(groups.items()):
+        singular, plural = first.get_numbered_name(count, looker, key=key)
+        thing_strings.append(singular if count == 1 else plural)
+    return thing_strings
 
 
 class Room(DefaultRoom, CustomObject):
@@ -21,8 +58,164 @@ class Room(DefaultRoom, CustomObject):
 
     See examples/object.py for a list of
     properties and methods available on all Objects.
+
+    The visible contents of a room are rendered once and shared by all
+    lookers with the same permission class, as long as the room's content
+    version stays the same. The version is bumped whenever objects enter
+    or leave, are renamed or re-aliased, characters are puppeted or
+    unpuppeted or a door in the room changes state. Only leaving the
+    looker itself out is done on every look, and the description is read
+    anew each time.
+
+    If a room holds more than `settings.ROOM_SUMMARY_THRESHOLD` visible
+    things, they are summarized as `settings.ROOM_SUMMARY_STRING` instead
+    of being listed.
+
+    The contents of a room are indexed by exits, occupants and things in
+    `content_index`, so hooks that only need one of these groups do not
+    have to check every object.
+
+    The traversal commands of all exits in the room are kept in one merged
+    exit cmdset on the room itself, which is only rebuilt when exits are
+    added, removed or re-aliased.
+
+    Messages sent with `broadcast` are queued in `broadcasts` for a short
+    tick and sent to each object in the room as one combined message.
+    `msg_contents` sends the queued messages before its own, so messages
+    such as says and arrivals are never received ahead of broadcasts
+    made before them.
     """
 
+    @lazy_property
+    def content_index(self) -> ContentIndexHandler:
+        return ContentIndexHandler(self)
+
+    @lazy_property
+    def broadcasts(self) -> BroadcastQueueHandler:
+        return BroadcastQueueHandler(self)
+
+    @property
+    def content_version(self) -> int:
+        return self.ndb._content_version or 0
+
+    def at_content_change(self, changed_obj=None):
+        self.ndb._content_version = self.content_version + 1
+        self.ndb._appearance_cache = None
+
+        if changed_obj is not None:
+            self.content_index.update(changed_obj)
+            if changed_obj.destination:
+                self.reset_exit_cmdset()
+
+    def at_object_receive(self, moved_obj, source_location, **kwargs):
+        super().at_object_receive(moved_obj, source_location, **kwargs)
+        self.content_index.add(moved_obj)
+        if moved_obj.destination:
+            self.reset_exit_cmdset()
+        self.at_content_change()
+
+    def at_object_leave(self, moved_obj, target_location, **kwargs):
+        super().at_object_leave(moved_obj, target_location, **kwargs)
+        self.content_index.remove(moved_obj)
+        if moved_obj.destination:
+            self.reset_exit_cmdset()
+        self.at_content_change()
+
+    def create_exit_cmdset(self):
+        """
+        Build a cmdset holding the traversal commands of all exits in the
+        room that pool their commands.
+
+        Returns:
+            exit_cmdset (CmdSet): The merged exit cmdset.
+        """
+        exit_cmdset = CmdSet(None)
+        exit_cmdset.key = "ExitCmdSet"
+        exit_cmdset.priority = 101
+        exit_cmdset.duplicates = True
+        for exit_obj in self.content_index.exits:
+            if hasattr(exit_obj, "get_exit_command"):
+                exit_cmdset.add(exit_obj.get_exit_command())
+        return exit_cmdset
+
+    def reset_exit_cmdset(self):
+        """
+        Mark the merged exit cmdset as outdated, so that it is rebuilt the
+        next time the room's cmdset is requested.
+        """
+        self.ndb._exit_cmdset_outdated = True
+
+    def at_cmdset_get(self, **kwargs):
+        super().at_cmdset_get(**kwargs)
+
+        exit_cmdset = self.ndb._exit_cmdset
+        if exit_cmdset is None or self.ndb._exit_cmdset_outdated or "force_init" in kwargs:
+            if exit_cmdset is not None:
+                self.cmdset.remove(exit_cmdset)
+            exit_cmdset = self.create_exit_cmdset()
+            self.cmdset.add(exit_cmdset, persistent=False)
+            self.ndb._exit_cmdset = exit_cmdset
+            self.ndb._exit_cmdset_outdated = False
+
+    def msg_contents(self, text=None, exclude=None, from_obj=None, mapping=None, **kwargs):
+        # send queued broadcasts first, so messages arrive in the order
+        # they were sent
+        self.broadcasts.flush()
+        super().msg_contents(text=text, exclude=exclude, from_obj=from_obj,
+                             mapping=mapping, **kwargs)
+
+    def broadcast(self, text, exclude=None, instant=False):
+        if instant:
+            self.msg_contents(text, exclude=exclude)
+        else:
+            self.broadcasts.add(text, exclude=exclude)
+
+    def get_appearance_parts(self, looker):
+        """
+        Identify and render everything in the room that `looker` can see,
+        including `looker` itself. The result is the same for every
+        looker with the same permission class.
+
+        Args:
+            looker (Object): Object doing the looking.
+
+        Returns:
+            exits (list): Display names of visible exits.
+            users (list): `(object id, display_name)` tuples for visible
+                puppeted objects.
+            things (list): All other visible objects.
+            thing_strings (list): Display strings for `things`, sorted
+                and pluralized, or the summary string if there are too
+                many of them.
+
+        """
+        index = self.content_index
+        exits = [con.get_display_name(looker)
+                 for con in filter_access(looker, index.exits, "view")]
+        users = [(con.id, "|c%s|n" % con.get_display_name(looker))
+                 for con in filter_access(looker, index.occupants, "view")]
+        things = filter_access(looker, index.things, "view")
+        return exits, users, things, self.get_thing_strings(things, looker)
+
+    def get_thing_strings(self, things, looker):
+        """
+        Render the visible things of the room.
+
+        Args:
+            things (list): The visible things.
+            looker (Object): Object doing the looking.
+
+        Returns:
+            thing_strings (list): Display strings for `things`, sorted and
+                pluralized, or the summary string if there are too many of
+                them.
+
+        """
+        # things can be pluralized (never pluralize users)
+        if len(things) > _ROOM_SUMMARY_THRESHOLD:
+            return [_ROOM_SUMMARY_STRING]
+        return group_things(things, looker)
+
     def return_appearance(self, looker, **kwargs):
         """
         This formats a description. It is the hook a 'look' command
@@ -36,20 +229,20 @@ class Room(DefaultRoom, CustomObject):
         if not looker:
             return ""
 
-        # get and identify all objects
-        visible = (con for con in self.contents if con !=
-                   looker and con.access(looker, "view"))
-        exits, users, things = [], [], defaultdict(list)
-
-        for con in visible:
-            key = con.get_display_name(looker)
-            if con.destination:
-                exits.append(key)
-            elif con.has_account:
-                users.append("|c%s|n" % key)
-            else:
-                # things can be pluralized
-                things[key].append(con)
+        cache = self.ndb._appearance_cache
+        if cache is None:
+            cache = self.ndb._appearance_cache = {}
+        cache_key = (self.content_version, get_permission_class(looker))
+        parts = cache.get(cache_key)
+        if parts is None:
+            parts = cache[cache_key] = self.get_appearance_parts(looker)
+        exits, users, things, thing_strings = parts
+
+        # leave out the looker itself
+        users = [key for con_id, key in users if con_id != looker.id]
+        if looker in things:
+            thing_strings = self.get_thing_strings(
+                [con for con in things if con != looker], looker)
 
         # get description, build string
         string = "\n|c%s|n\n" % self.get_display_name(looker)
@@ -62,19 +255,7 @@ class Room(DefaultRoom, CustomObject):
         else:
             string += "\n|wThere are no visible exits.|n"
 
-        if users or things:
-            # handle pluralization of things (never pluralize users)
-            thing_strings = []
-            for key, itemlist in sorted(things.items()):
-                item_count = len(itemlist)
-                if item_count == 1:
-                    key, _ = itemlist[0].get_numbered_name(
-                        item_count, looker, key=key)
-                else:
-                    key = [item.get_numbered_name(item_count, looker, key=key)[
-                        1] for item in itemlist][0]
-                thing_strings.append(key)
-
+        if users or thing_strings:
             string += "\n|wYou see:|n " + \
                 list_to_string(users + thing_strings)
 
@@ -0,0 +1,168 @@
+"""
+Access
+
+Helpers for checking locks for one accessor against many objects at
+once, such as everything in a room during a `look`.
+
+Objects with the same lock definition for the checked access type are
+checked together: the lock is evaluated once per distinct definition,
+and the result is used for every object having it. This is only done
+for definitions whose lock functions look at the accessor alone (such
+as `perm()`, `id()` or `attr()`), listed in `ACCESSOR_LOCKFUNCS`. Locks
+using functions that look at the accessed object (such as `holds()`
+or `objattr()`) are evaluated for each object. Nothing is kept between
+calls, so changes to locks, permissions or other state are always
+seen. The `at_access` hook of every object is called as usual.
+
+`check_access` checks several access types on one object, calling each
+lock function they share only once.
+
+"""
+
+# lock functions whose result only depends on the accessor
+ACCESSOR_LOCKFUNCS = frozenset((
+    "true", "all", "false", "none", "superuser", "serversetting",
+    "perm", "perm_above", "pperm", "pperm_above",
+    "id", "dbref", "pid", "pdbref",
+    "attr", "attr_eq", "attr_gt", "attr_ge", "attr_lt", "attr_le", "attr_ne",
+    "tag",
+))
+
+
+def get_permission_class(accessor):
+    """
+    Get a hashable summary of everything about `accessor` that lock checks
+    and display names normally depend on.
+
+    Args:
+        accessor (Object): The object doing the accessing.
+
+    Returns:
+        permission_class (tuple): The permission class of `accessor`.
+
+    """
+    account = accessor.account if accessor.has_account else None
+    return (
+        accessor.is_superuser,
+        tuple(sorted(accessor.permissions.all())),
+        tuple(sorted(account.permissions.all())) if account else (),
+        bool(account and account.attributes.has("_quell")),
+    )
+
+
+def _shared_lock(obj, access_type):
+    """
+    Get the lock definition of an object for an access type, if its
+    result is the same for any object having it.
+
+    Returns:
+        lock (str, None or False): The lock definition, `None` if the
+            object has no lock of the type, or `False` if the lock has
+            to be evaluated for this object alone.
+
+    """
+    lock = obj.locks.locks.get(access_type)
+    if lock is None:
+        return None
+    if all(func.__name__ in ACCESSOR_LOCKFUNCS for func, _, _ in lock[1]):
+        return lock[2]
+    return False
+
+
+def filter_access(accessor, objects, access_type, default=False):
+    """
+    Check one access type for one accessor on a whole list of objects.
+
+    Args:
+        accessor (Object): The object trying to gain access.
+        objects (iterable): The objects to check.
+        access_type (str): The type of access, like "view".
+        default (bool, optional): Result if an object has no lock of
+            this type.
+
+    Returns:
+        passed (list): The objects `accessor` has access to, in the
+            order given.
+
+    """
+    results = {}
+    passed = []
+    for obj in objects:
+        lock = _shared_lock(obj, access_type)
+        if lock is False:
+            result = obj.access(accessor, access_type, default=default)
+        elif lock in results:
+            result = results[lock]
+            obj.at_access(result, accessor, access_type)
+        else:
+            result = results[lock] = obj.access(accessor, access_type, default=default)
+        if result:
+            passed.append(obj)
+    return passed
+
+
+def _evaluate(lock, accessor, obj, calls):
+    """
+    Evaluate a parsed lock definition, the way `LockHandler.check` does,
+    reusing the results of lock function calls already made.
+
+    Args:
+        lock (tuple): The parsed lock, from `obj.locks.locks`.
+        accessor (Object): The object trying to gain access.
+        obj (Object): The object accessed.
+        calls (dict): Lock function results by function and arguments,
+            filled in as functions are called.
+
+    Returns:
+        result (bool): If the lock passed.
+
+    """
+    evalstring, funcs, _ = lock
+    true_false = []
+    for func, args, kwargs in funcs:
+        call = (func, args, tuple(kwargs.items()))
+        result = calls.get(call)
+        if result is None:
+            result = calls[call] = bool(func(accessor, obj, *args, **kwargs))
+        true_false.append(result)
+    return eval(evalstring % tuple(true_false))
+
+
+def check_access(accessor, obj, access_types, default=False):
+    """
+    Check if `accessor` passes any of several access types on one object.
+    The parsed locks of the object are looked up once, and a lock
+    function used by more than one of the access types, such as
+    `perm(Builder)`, is only called once.
+
+    Args:
+        accessor (Object): The object trying to gain access.
+        obj (Object): The object to check.
+        access_types (str or iterable): One access type, or several of
+            which any one is enough.
+        default (bool, optional): Result if the object has no lock of
+            a given type.
+
+    Returns:
+        result (bool): If access was granted.
+
+    """
+    if isinstance(access_types, str):
+        access_types = (access_types,)
+    try:
+        bypass = accessor.locks.lock_bypass
+    except AttributeError:
+        # let obj.access work out the bypass
+        bypass = True
+    locks = obj.locks.locks
+    calls = {}
+    for access_type in access_types:
+        lock = locks.get(access_type)
+        if bypass or lock is None:
+            result = obj.access(accessor, access_type, default=default)
+        else:
+            result = _evaluate(lock, accessor, obj, calls)
+            obj.at_access(result, accessor, access_type)
+        if result:
+            return True
+    return False
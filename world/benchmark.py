@@ -0,0 +1,230 @@
+"""
+Command throughput benchmark
+
+Drives the game's commands through Evennia's real cmdhandler against a
+throwaway test database and reports throughput and latency per command.
+Run it with the Evennia test runner, from the game directory:
+
+    evennia test --settings settings.py world.benchmark
+
+The module is not named `test*.py`, so it is not picked up by a normal
+`evennia test .` run.
+
+The benchmark is configured through environment variables:
+
+    BENCH_CHARACTERS - number of Characters to create (default 50)
+    BENCH_ROUNDS     - times each Character runs through its mix (default 20)
+    BENCH_MIX        - comma-separated names of the mixes in `MIXES` to use,
+                       assigned to the Characters in turn (default: all)
+
+Every Character starts out standing next to a closed pair of Doors named
+`door`, holding a `helmet` in its right hand. Each mix is written so that
+running it leaves the Character in that same state.
+
+A command fails the benchmark if the Deferred returned by the cmdhandler
+did not fire or fired with a Failure, or if its caller was sent one of
+`ERROR_MARKERS`, as the cmdhandler reports errors to the caller instead
+of raising them. The reactor does not run under the test runner, so the
+write-behind buffer and the rooms' broadcast queues are flushed after
+every round, and timed separately. The report is written to the server
+log.
+
+"""
+import os
+import time
+from collections import defaultdict
+
+from twisted.python.failure import Failure
+
+from evennia.commands.cmdhandler import cmdhandler
+from evennia.utils import logger
+from evennia.utils.create import create_object
+from evennia.utils.test_resources import EvenniaTest
+
+from typeclasses.characters import Character, Hand
+from typeclasses.exits import Door, Exit
+from typeclasses.objects import CustomObject, WearableObject
+from typeclasses.rooms import Room
+from world import writebehind
+
+# scripted input sequences
+MIXES = {
+    "equipment": ["wear helmet", "eq", "i", "remove helmet", "eq"],
+    "posture": ["sit", "stand", "kneel", "stand", "lie", "stand"],
+    "doors": ["open door", "close door", "look"],
+    "travel": ["open door", "door", "look", "door", "close door"],
+    "building": ["desc here = A plain benchmarking room.", "desc helmet", "look"],
+}
+
+# parts of the messages showing that a command failed
+ERROR_MARKERS = (
+    "Traceback", "error occurred", "is not available", "There were multiple matches",
+    "Could not find", "what?", "You can't", "You aren't", "You don't", "You have to",
+    "already",
+)
+
+
+def percentile(sorted_values, percent):
+    """
+    Get a percentile from sorted values using the nearest-rank method.
+
+    Args:
+        sorted_values (list): The values, sorted in ascending order.
+        percent (float): The percentile to get, between 0 and 100.
+
+    Returns:
+        value (float): The percentile.
+
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(percent / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def format_report(timings, flushes, elapsed):
+    """
+    Format the collected timings as a table.
+
+    Args:
+        timings (dict): Lists of per-call durations in seconds, by command.
+        flushes (list): Durations of the flushes after each round, in
+            seconds.
+        elapsed (float): Total wall time of the run in seconds, flushes
+            included.
+
+    Returns:
+        report (str): The report.
+
+    """
+    lines = [
+        "{0:<12} {1:>8} {2:>10} {3:>9} {4:>9} {5:>9}".format(
+            "command", "calls", "cmds/s", "p50 ms", "p95 ms", "p99 ms")
+    ]
+    total = 0
+    for command, durations in sorted(timings.items()):
+        durations = sorted(durations)
+        total += len(durations)
+        lines.append(
+            "{0:<12} {1:>8} {2:>10.1f} {3:>9.3f} {4:>9.3f} {5:>9.3f}".format(
+                command,
+                len(durations),
+                len(durations) / sum(durations) if sum(durations) else 0.0,
+                percentile(durations, 50) * 1000,
+                percentile(durations, 95) * 1000,
+                percentile(durations, 99) * 1000,
+            )
+        )
+    lines.append("{0} flushes, {1:.3f} ms each on average".format(
+        len(flushes), sum(flushes) / len(flushes) * 1000 if flushes else 0.0))
+    lines.append("{0} commands in {1:.2f}s, {2:.1f} cmds/s overall".format(
+        total, elapsed, total / elapsed if elapsed else 0.0))
+    return "\n".join(lines)
+
+
+class CommandThroughputBenchmark(EvenniaTest):
+    """
+    Sets up the world and runs the benchmark.
+
+    """
+
+    character_typeclass = Character
+    exit_typeclass = Exit
+    object_typeclass = CustomObject
+    room_typeclass = Room
+
+    def setUp(self):
+        super().setUp()
+        self.num_characters = int(os.environ.get("BENCH_CHARACTERS", 50))
+        self.rounds = int(os.environ.get("BENCH_ROUNDS", 20))
+        mix_names = os.environ.get("BENCH_MIX")
+        self.mix_names = mix_names.split(",") if mix_names else sorted(MIXES)
+        # (receiver, text) of the messages sent during the current command
+        self.received = []
+
+        self.bench_room = create_object(Room, key="Bench room")
+        self.far_room = create_object(Room, key="Far room")
+        door = create_object(Door, key="door", location=self.bench_room,
+                             destination=self.far_room)
+        back_door = create_object(Door, key="door", location=self.far_room,
+                                  destination=self.bench_room)
+        door.set_pair(back_door)
+
+        self.characters = []
+        for index in range(self.num_characters):
+            character = create_object(Character, key="bencher%i" % index,
+                                      location=self.bench_room, home=self.bench_room)
+            character.permissions.add("Builder")
+            helmet = create_object(WearableObject, key="helmet", location=character)
+            helmet.db.wearable_location = "head"
+            character.equipment.set_held(Hand.right, helmet)
+            self.capture_messages(character)
+            self.characters.append(character)
+        self.rooms = [self.bench_room, self.far_room]
+        writebehind.flush()
+
+    def capture_messages(self, character):
+        """
+        Keep the messages sent to a Character in `received`, as well as
+        sending them as usual.
+
+        """
+        send = character.msg
+
+        def msg(text=None, *args, **kwargs):
+            if text is not None:
+                self.received.append((character, str(text[0] if isinstance(text, tuple) else text)))
+            return send(text, *args, **kwargs)
+
+        character.msg = msg
+
+    def run_command(self, character, raw_string):
+        """
+        Run one command, and get why it failed, if it did.
+
+        Returns:
+            error (str or None): What went wrong, or `None`.
+
+        """
+        results = []
+        cmdhandler(character, raw_string, callertype="object").addBoth(results.append)
+        if not results:
+            return "did not finish"
+        if isinstance(results[0], Failure):
+            return results[0].getErrorMessage()
+        for receiver, text in self.received:
+            if receiver == character and any(marker in text for marker in ERROR_MARKERS):
+                return text
+        return None
+
+    def test_command_throughput(self):
+        scripts = [
+            (character, MIXES[self.mix_names[index % len(self.mix_names)]])
+            for index, character in enumerate(self.characters)
+        ]
+        timings = defaultdict(list)
+        flushes = []
+        errors = []
+
+        start = time.perf_counter()
+        for _ in range(self.rounds):
+            for character, mix in scripts:
+                for raw_string in mix:
+                    del self.received[:]
+                    before = time.perf_counter()
+                    error = self.run_command(character, raw_string)
+                    timings[raw_string.split(None, 1)[0]].append(time.perf_counter() - before)
+                    if error:
+                        errors.append("{0} '{1}': {2}".format(character.key, raw_string, error))
+
+            # the reactor would run these between commands
+            before = time.perf_counter()
+            writebehind.flush()
+            for room in self.rooms:
+                room.broadcasts.flush()
+            flushes.append(time.perf_counter() - before)
+        elapsed = time.perf_counter() - start
+
+        logger.log_info("Command throughput benchmark:\n" + format_report(timings, flushes, elapsed))
+        self.assertFalse(errors, "{0} commands failed, first: {1}".format(
+            len(errors), errors[0] if errors else ""))
@@ -0,0 +1,80 @@
+"""
+Room broadcasts
+
+The `BroadcastQueueHandler` collects the messages sent to the contents
+of a room during a short tick and then sends each object in the room
+everything meant for it as one combined message. When forty characters sit down
+at once, everyone in the room then gets one message listing all of them
+instead of forty separate ones. It is made available on Rooms as
+`room.broadcasts`, and is used through `room.broadcast`.
+
+The tick length is `settings.ROOM_BROADCAST_TICK` seconds. Setting it
+to 0 sends every broadcast right away.
+
+Recipients are picked when the queue is flushed, so an object that
+leaves the room during the tick does not get the messages queued before
+it left.
+
+"""
+from django.conf import settings
+
+from evennia.utils.utils import delay
+
+_ROOM_BROADCAST_TICK = settings.ROOM_BROADCAST_TICK
+
+
+class BroadcastQueueHandler:
+    """
+    Handler for the messages waiting to be broadcast in a room.
+
+    """
+
+    __slots__ = ("obj", "_queue", "_scheduled")
+
+    def __init__(self, obj):
+        """
+        Args:
+            obj (Room): The room this handler is attached to.
+
+        """
+        self.obj = obj
+        self._queue = []
+        self._scheduled = False
+
+    def add(self, text, exclude=None):
+        """
+        Queue a message for everything in the room.
+
+        Args:
+            text (str): The message.
+            exclude (list, optional): Objects that should not receive
+                the message.
+
+        """
+        if _ROOM_BROADCAST_TICK <= 0:
+            self.obj.msg_contents(text, exclude=exclude)
+            return
+
+        self._queue.append((text, frozenset(obj.id for obj in exclude or ())))
+        if not self._scheduled:
+            self._scheduled = True
+            delay(_ROOM_BROADCAST_TICK, self.flush)
+
+    def flush(self):
+        """
+        Send all queued messages, one combined message per receiver.
+
+        """
+        queue = self._queue
+        self._queue = []
+        self._scheduled = False
+        if not queue:
+            return
+
+        for obj in self.obj.contents:
+            lines = [text for text, exclude in queue if obj.id not in exclude]
+            if lines:
+                obj.msg("\n".join(lines))
+
+    def __len__(self):
+        return len(self._queue)
@@ -0,0 +1,184 @@
+"""
+Bulk spawning
+
+`bulk_spawn` creates many objects from one prototype (see
+`world/prototypes.py`) much faster than Evennia's `spawn`, which saves
+every object on its own and then adds each of its Attributes and Tags
+with a separate insert.
+
+Everything is done in one transaction. The objects are inserted with
+one `bulk_create`, then all of their Attributes with another, and all
+of their Tags (including aliases and permissions, which are Tags too)
+are linked with a third. Only then are the creation hooks run on each
+object, the same ones `create_object` runs, after the object is added
+to the contents cache of its location (which inserting it does not
+do). Attributes that a typeclass gives every new object are declared
+in its `creation_attrs` and inserted together with the prototype's, so
+`at_object_creation` does not write them again one by one. Writes the
+hooks make through the write-behind buffer (see `world.writebehind`)
+are saved at the end of the same transaction.
+
+Prototypes given by key are taken already merged with their parents
+from `world.prototype_cache`. Values given as callables in the
+prototype, such as `"health": lambda: randint(20, 30)`, are called once
+per object, as with `spawn`.
+
+"""
+from django.db import connection, transaction
+from django.db.models import Max
+
+import evennia
+from evennia.objects.models import ObjectDB
+from evennia.prototypes import spawner
+from evennia.typeclasses.attributes import Attribute
+from evennia.utils.dbserialize import to_pickle
+from evennia.utils.utils import make_iter
+
+from world import prototype_cache, writebehind
+
+# objects fetched per query, below the SQLite variable limit
+_CHUNK_SIZE = 500
+
+
+def _bulk_insert(model, rows):
+    """
+    Insert rows with one `bulk_create` and make sure each row has its
+    primary key set afterwards, also on databases that do not return
+    them (such as SQLite). Those are only safe to use inside a
+    transaction, so no other rows get inserted in between.
+
+    Args:
+        model (Model): The model class.
+        rows (list): Unsaved model instances.
+
+    Returns:
+        rows (list): The saved instances.
+
+    """
+    if not rows:
+        return rows
+    features = connection.features
+    if getattr(features, "can_return_rows_from_bulk_insert",
+               getattr(features, "can_return_ids_from_bulk_insert", False)):
+        return model.objects.bulk_create(rows)
+
+    last_id = model.objects.aggregate(Max("id"))["id__max"] or 0
+    model.objects.bulk_create(rows)
+    ids = list(model.objects.filter(id__gt=last_id).order_by("id").values_list("id", flat=True))
+    if len(ids) != len(rows):
+        raise RuntimeError("Rows were inserted into {0} during a bulk spawn.".format(
+            model.__name__))
+    for row, pk in zip(rows, ids):
+        row.pk = pk
+    return rows
+
+
+def _tag_links(obj_tags):
+    """
+    Get or create the Tags needed and link them to the objects.
+
+    Args:
+        obj_tags (list): (object id, key, category, data, tagtype) tuples.
+
+    """
+    tags = {}
+    through = ObjectDB.db_tags.through
+    links = []
+    for obj_id, key, category, data, tagtype in obj_tags:
+        key = str(key).strip().lower()
+        category = category.strip().lower() if category else category
+        tag = tags.get((key, category, tagtype))
+        if tag is None:
+            tag = tags[(key, category, tagtype)] = ObjectDB.objects.create_tag(
+                key=key, category=category, data=data, tagtype=tagtype)
+        links.append(through(objectdb_id=obj_id, tag_id=tag.id))
+    through.objects.bulk_create(links)
+
+
+def bulk_spawn(prototype, count, location=None):
+    """
+    Create many objects from one prototype.
+
+    Args:
+        prototype (str or dict): The prototype or its `prototype_key`.
+        count (int): How many objects to create.
+        location (Object, optional): Where to put the objects, instead of
+            the `location` of the prototype.
+
+    Returns:
+        objects (list): The new objects.
+
+    Raises:
+        KeyError: If there is no prototype with the given key.
+
+    """
+    if isinstance(prototype, str):
+        key = prototype
+        prototype = prototype_cache.get(key)
+        if prototype is None:
+            raise KeyError(key)
+    objparams = spawner.spawn(*([prototype] * count), only_validate=True)
+
+    with transaction.atomic():
+        dbobjs = []
+        for create_kwargs, *_ in objparams:
+            if location is not None:
+                create_kwargs["db_location"] = location
+                create_kwargs["db_home"] = create_kwargs.get("db_home") or location
+            dbobjs.append(ObjectDB(**create_kwargs))
+        ids = [dbobj.pk for dbobj in _bulk_insert(ObjectDB, dbobjs)]
+
+        # load the objects through the idmapper, as typeclassed instances
+        objs = []
+        for index in range(0, len(ids), _CHUNK_SIZE):
+            objs.extend(ObjectDB.objects.filter(
+                id__in=ids[index:index + _CHUNK_SIZE]).order_by("id"))
+
+        attributes = []
+        attr_owners = []
+        obj_tags = []
+        for obj, (_, permissions, _, aliases, _, attrs, tags, _) in zip(objs, objparams):
+            merged = {(key, None): (key, value, None, "")
+                      for key, value in getattr(obj, "creation_attrs", {}).items()}
+            for attr in attrs:
+                key, value, category, lockstring = (tuple(attr) + (None, None, ""))[:4]
+                merged[(key, category)] = (key, value, category, lockstring or "")
+            for key, value, category, lockstring in merged.values():
+                attributes.append(Attribute(
+                    db_key=key, db_value=to_pickle(value), db_category=category,
+                    db_lock_storage=lockstring, db_model="objectdb", db_attrtype=None))
+                attr_owners.append(obj.id)
+
+            for tag in make_iter(tags):
+                key, category, data = (tuple(make_iter(tag)) + (None, None))[:3]
+                obj_tags.append((obj.id, key, category, data, None))
+            for alias in make_iter(aliases):
+                obj_tags.append((obj.id, alias, None, None, "alias"))
+            for permission in make_iter(permissions):
+                obj_tags.append((obj.id, permission, None, None, "permission"))
+
+        through = ObjectDB.db_attributes.through
+        through.objects.bulk_create([
+            through(objectdb_id=obj_id, attribute_id=attr.id)
+            for obj_id, attr in zip(attr_owners, _bulk_insert(Attribute, attributes))])
+        _tag_links(obj_tags)
+
+        for obj, (_, _, lockstring, _, nattributes, _, _, execs) in zip(objs, objparams):
+            obj.ndb.bulk_spawned = True
+            obj.basetype_setup()
+            obj.at_object_creation()
+            if lockstring:
+                obj.locks.add(lockstring)
+            if obj.location:
+                obj.location.contents_cache.add(obj)
+            for key, value in (nattributes or {}).items():
+                obj.nattributes.add(key, value)
+            obj.basetype_posthook_setup()
+            del obj.ndb.bulk_spawned
+            for code in make_iter(execs):
+                if code:
+                    exec(code, {}, {"evennia": evennia, "obj": obj})
+
+        writebehind.flush()
+
+    return objs
@@ -0,0 +1,132 @@
+"""
+Content index
+
+The `ContentIndexHandler` keeps the contents of a room split into exits,
+occupants (objects puppeted by an Account) and other things, so code
+that only cares about one of these groups does not have to look at
+every object in the room. It is made available on Rooms as
+`room.content_index`.
+
+The index is built from the room's contents the first time it is used
+and is then kept current by the room's receive/leave hooks, which are
+also called for objects deleted in the room, and by `at_content_change`
+when a Character is puppeted or unpuppeted and when a new object is
+created in the room. Reading a group does not check the objects in it
+again. Use `reset()` after moving objects around by setting `location`
+directly.
+
+"""
+
+EXITS = 0
+OCCUPANTS = 1
+THINGS = 2
+
+
+class ContentIndexHandler:
+    """
+    Handler for a room's categorized contents.
+
+    """
+
+    __slots__ = ("obj", "_groups", "_category", "_loaded")
+
+    def __init__(self, obj):
+        """
+        Args:
+            obj (Room): The room this handler is attached to.
+
+        """
+        self.obj = obj
+        self._groups = ({}, {}, {})
+        self._category = {}
+        self._loaded = False
+
+    def _load(self):
+        """
+        Build the index from the room's current contents.
+
+        """
+        self._groups = ({}, {}, {})
+        self._category = {}
+        self._loaded = True
+        for obj in self.obj.contents:
+            self._add(obj)
+
+    def _add(self, obj):
+        if obj.destination:
+            category = EXITS
+        elif obj.has_account:
+            category = OCCUPANTS
+        else:
+            category = THINGS
+        self._category[obj] = category
+        self._groups[category][obj] = None
+
+    def _get(self, category):
+        if not self._loaded:
+            self._load()
+        return list(self._groups[category])
+
+    def add(self, obj):
+        """
+        Add an object that has arrived in the room.
+
+        Args:
+            obj (Object): The new object.
+
+        """
+        if not self._loaded:
+            return
+        self.remove(obj)
+        self._add(obj)
+
+    def remove(self, obj):
+        """
+        Remove an object that has left the room.
+
+        Args:
+            obj (Object): The object that left.
+
+        """
+        category = self._category.pop(obj, None)
+        if category is not None:
+            self._groups[category].pop(obj, None)
+
+    def update(self, obj):
+        """
+        Re-categorize an object whose state has changed, such as a
+        Character being puppeted. Removes the object if it is no longer
+        in the room.
+
+        Args:
+            obj (Object): The changed object.
+
+        """
+        if obj.location == self.obj:
+            self.add(obj)
+        else:
+            self.remove(obj)
+
+    @property
+    def exits(self):
+        """All exits in the room."""
+        return self._get(EXITS)
+
+    @property
+    def occupants(self):
+        """All objects in the room puppeted by an Account."""
+        return self._get(OCCUPANTS)
+
+    @property
+    def things(self):
+        """All objects in the room that are neither exits nor occupants."""
+        return self._get(THINGS)
+
+    def reset(self):
+        """
+        Rebuild the index from the room's contents on next access.
+
+        """
+        self._groups = ({}, {}, {})
+        self._category = {}
+        self._loaded = False
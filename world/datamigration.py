@@ -0,0 +1,237 @@
+"""
+Data migrations
+
+Rewriting how a typeclass stores its Attributes means converting every
+existing object of that typeclass. A `DataMigration` does this in the
+background of the running server: objects are read in chunks of
+`settings.MIGRATION_CHUNK_SIZE`, ordered by id and starting after the
+last id done (so no chunk ever needs an OFFSET, and the table is never
+loaded whole), each chunk is converted and committed in one
+transaction, and the server goes back to serving players for
+`settings.MIGRATION_CHUNK_DELAY` seconds before the next one. Chunks run
+in the reactor thread, so a chunk that takes longer than
+`settings.MIGRATION_CHUNK_TIME` seconds is committed early, and the next
+chunk continues after the last object it converted.
+
+The id of the last converted object is stored as a ServerConfig value
+after every chunk. A migration that is stopped, or cut short by a
+reload, continues from there when started again. The ids of objects
+that could not be converted are stored as well, and a migration that is
+started again first tries those objects again.
+
+Objects that were not in the idmapper cache before their chunk was
+read are removed from it again afterwards, so a migration does not
+fill the server's memory with every object it touched.
+
+Migrations are registered in `MIGRATIONS` and run with the `migrate`
+command.
+
+"""
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+from evennia.server.models import ServerConfig
+from evennia.utils import logger
+from evennia.utils.utils import class_from_module, delay
+
+_MIGRATION_CHUNK_SIZE = settings.MIGRATION_CHUNK_SIZE
+_MIGRATION_CHUNK_TIME = settings.MIGRATION_CHUNK_TIME
+_MIGRATION_CHUNK_DELAY = settings.MIGRATION_CHUNK_DELAY
+
+# running DataMigrations by name
+RUNNING = {}
+
+
+def convert_equipment(character):
+    """
+    Move a Character's legacy `db.equipment`/`db.inventory` dicts into
+    per-slot Attributes, see `world.equipment`.
+
+    """
+    # loading the slots converts the legacy dicts
+    character.equipment.all_worn()
+
+
+def convert_position(character):
+    """
+    Rewrite a Character's pickled position and hand in the compact enum
+    form, see `world.enumcodec`.
+
+    """
+    character.enums.get("physical_position")
+    character.enums.get("dominant_hand")
+
+
+def convert_door_state(door):
+    """
+    Rewrite a Door's pickled state in the compact enum form.
+
+    """
+    door.enums.get("door_state")
+
+
+# (typeclass path, converter, description) by migration name
+MIGRATIONS = {
+    "equipment": (
+        "typeclasses.characters.Character",
+        convert_equipment,
+        "Character equipment dicts to per-slot Attributes",
+    ),
+    "positions": (
+        "typeclasses.characters.Character",
+        convert_position,
+        "Character position and hand to compact enums",
+    ),
+    "doors": (
+        "typeclasses.exits.Door",
+        convert_door_state,
+        "Door state to compact enums",
+    ),
+}
+
+
+class DataMigration:
+    """
+    One run of a registered migration.
+
+    """
+
+    def __init__(self, name, caller=None):
+        """
+        Args:
+            name (str): The migration name, a key of `MIGRATIONS`.
+            caller (Object, optional): Receives a message when the
+                migration ends.
+
+        """
+        typeclass_path, self.converter, self.description = MIGRATIONS[name]
+        self.name = name
+        self.typeclass = class_from_module(typeclass_path)
+        self.caller = caller
+        self.checkpoint_key = "migration_{0}".format(name)
+        self.failed_key = "migration_{0}_failed".format(name)
+        self.last_id = ServerConfig.objects.conf(self.checkpoint_key, default=0)
+        # ids of objects that failed in earlier runs, to try again first
+        self.retry_ids = sorted(ServerConfig.objects.conf(self.failed_key, default=[]))
+        # ids of objects that failed in this run
+        self.failed_ids = []
+        self.converted = 0
+        self.started = None
+        self.stopping = False
+
+    def start(self):
+        """
+        Start converting, from the checkpoint if there is one.
+
+        """
+        RUNNING[self.name] = self
+        self.started = time.time()
+        logger.log_info("Data migration '{0}' starting after id {1}.".format(
+            self.name, self.last_id))
+        delay(0, self.run_chunk)
+
+    def stop(self):
+        """
+        Stop after the current chunk. The checkpoint is kept.
+
+        """
+        self.stopping = True
+
+    def run_chunk(self):
+        """
+        Convert the next chunk of objects and schedule the one after it.
+
+        """
+        if self.stopping:
+            self.finish("stopped")
+            return
+
+        try:
+            done = self.convert_chunk()
+        except Exception:
+            logger.log_trace("Data migration '{0}' failed after id {1}.".format(
+                self.name, self.last_id))
+            self.finish("failed")
+            return
+
+        if done:
+            ServerConfig.objects.conf(self.checkpoint_key, delete=True)
+            if not self.failed_ids:
+                ServerConfig.objects.conf(self.failed_key, delete=True)
+            self.finish("done")
+        else:
+            delay(_MIGRATION_CHUNK_DELAY, self.run_chunk)
+
+    def convert_chunk(self):
+        """
+        Convert one chunk of objects in one transaction. Objects that
+        failed before are tried again first.
+
+        Returns:
+            done (bool): If there were no objects left to convert.
+
+        """
+        retrying = bool(self.retry_ids)
+        if retrying:
+            ids = self.retry_ids[:_MIGRATION_CHUNK_SIZE]
+        else:
+            queryset = self.typeclass.objects.all_family().filter(id__gt=self.last_id)
+            ids = list(queryset.order_by("id").values_list("id", flat=True)[:_MIGRATION_CHUNK_SIZE])
+            if not ids:
+                return True
+
+        model = self.typeclass._meta.concrete_model
+        cached = {pk for pk in ids if model.get_cached_instance(pk) is not None}
+        objs = list(self.typeclass.objects.all_family().filter(id__in=ids).order_by("id"))
+        # the last id handled, ids up to it are done with
+        last_id = ids[-1]
+        start = time.perf_counter()
+        with transaction.atomic():
+            for obj in objs:
+                try:
+                    with transaction.atomic():
+                        self.converter(obj)
+                        obj.writebehind.flush()
+                    self.converted += 1
+                except Exception:
+                    logger.log_trace("Data migration '{0}' could not convert {1}.".format(
+                        self.name, obj.dbref))
+                    self.failed_ids.append(obj.id)
+                if time.perf_counter() - start >= _MIGRATION_CHUNK_TIME:
+                    last_id = obj.id
+                    break
+
+            if retrying:
+                self.retry_ids = [pk for pk in self.retry_ids if pk > last_id]
+            else:
+                self.last_id = last_id
+                ServerConfig.objects.conf(self.checkpoint_key, self.last_id)
+            failed = self.retry_ids + self.failed_ids
+            if failed:
+                ServerConfig.objects.conf(self.failed_key, failed)
+            else:
+                ServerConfig.objects.conf(self.failed_key, delete=True)
+
+        for obj in objs:
+            if obj.id not in cached:
+                obj.flush_from_cache()
+        return False
+
+    def finish(self, result):
+        """
+        End the run and report the result.
+
+        Args:
+            result (str): How the run ended.
+
+        """
+        RUNNING.pop(self.name, None)
+        message = "Data migration '{0}' {1}: {2} converted, {3} failed, last id {4}.".format(
+            self.name, result, self.converted, len(self.failed_ids), self.last_id)
+        if self.failed_ids:
+            message += " Start it again to retry the failed objects."
+        logger.log_info(message)
+        if self.caller:
+            self.caller.msg(message)
@@ -0,0 +1,112 @@
+"""
+Doors
+
+Bulk operations on Doors, for resetting whole areas at once. Doors are
+picked by Tag, so a zone is simply a Tag in the `zone` category.
+
+Changing many doors is done in one transaction, with one query per
+chunk of doors finding their `door_state` Attributes and one UPDATE per
+chunk of Attributes, instead of a read and a save per door. Both sides
+of each pair are written, see `DoorRecord`.
+
+"""
+from django.db import transaction
+
+from evennia import search_tag
+from evennia.objects.models import ObjectDB
+from evennia.typeclasses.attributes import Attribute
+
+from typeclasses.exits import Door
+from world.enumcodec import encode
+
+ZONE_CATEGORY = "zone"
+
+# keep the number of ids per query below the SQLite variable limit
+_CHUNK_SIZE = 500
+
+
+def find_doors(tag, category=None):
+    """
+    Find all Doors with a given Tag.
+
+    Args:
+        tag (str): The Tag key.
+        category (str, optional): The Tag category, such as `ZONE_CATEGORY`.
+
+    Returns:
+        doors (list): The matching Doors.
+
+    """
+    return [obj for obj in search_tag(tag, category=category) if isinstance(obj, Door)]
+
+
+def set_door_states(doors, state):
+    """
+    Set the state of many Doors in one transaction. No messages are sent
+    to the rooms involved.
+
+    Args:
+        doors (iterable): The Doors to change. Giving one side of a pair
+            changes both.
+        state (DoorState): The new state.
+
+    Returns:
+        changed (int): The number of door pairs whose state changed.
+
+    """
+    records = {}
+    for door in doors:
+        record = door.door_record
+        records[record.owner.id] = record
+
+    changed = [record for record in records.values() if record.state != state]
+    if not changed:
+        return 0
+
+    sides = {}
+    for record in changed:
+        owner = record.owner
+        for door in (owner, owner.pair):
+            if door:
+                sides[door.id] = door
+
+    value = encode(state)
+    through = ObjectDB.db_attributes.through
+    ids = list(sides)
+    with transaction.atomic():
+        attr_ids = {}
+        for index in range(0, len(ids), _CHUNK_SIZE):
+            attr_ids.update(through.objects.filter(
+                objectdb_id__in=ids[index:index + _CHUNK_SIZE],
+                attribute__db_key="door_state",
+                attribute__db_category__isnull=True,
+            ).values_list("objectdb_id", "attribute_id"))
+
+        for door in sides.values():
+            # this write replaces any pending one
+            door.writebehind.discard("door_state")
+            if door.id not in attr_ids:
+                door.attributes.add("door_state", value, strattr=True)
+
+        attr_ids = list(attr_ids.values())
+        for index in range(0, len(attr_ids), _CHUNK_SIZE):
+            Attribute.objects.filter(
+                id__in=attr_ids[index:index + _CHUNK_SIZE]).update(
+                    db_strvalue=value, db_value=None)
+
+    # only once saved, so a rollback leaves the records as they were
+    for record in changed:
+        record.state = state
+
+    # keep the cached Attributes current
+    for attr_id in attr_ids:
+        attr = Attribute.get_cached_instance(attr_id)
+        if attr is not None:
+            attr.db_strvalue = value
+            attr.db_value = None
+
+    for location in {door.location for door in sides.values()}:
+        if location:
+            location.at_content_change()
+
+    return len(changed)
@@ -0,0 +1,163 @@
+"""
+Enum Attributes
+
+Enum members stored as regular Attributes are pickled, and unpickling
+them means importing their module and looking up their class on every
+read. The `EnumAttributeHandler` stores them as short strings instead,
+such as "position:2", in the string value of the Attribute, and decodes
+them with a dict lookup. It is made available on all objects as
+`obj.enums`, and writes through the object's write-behind buffer (see
+`world.writebehind`).
+
+An enum can only be stored this way once its class is registered under
+a code, with the `register` decorator. Its member values must be ints.
+The code and the member values are what ends up in the database, so
+neither should change once members have been stored:
+
+    @register("position")
+    class PhysicalPosition(enum.Enum):
+        ...
+
+Attributes written before this handler existed hold a pickled member.
+They are still read, and rewritten in the compact form the first time
+they are, which also clears the pickled value.
+
+Enum Attributes must only be read and written through `obj.enums`.
+Since their value is not pickled, `obj.db` and `obj.attributes.get`
+without `strattr` see them as `None`.
+
+"""
+from evennia.utils import logger
+
+# enum classes by code, and codes by enum class
+ENUM_CLASSES = {}
+_CODES = {}
+
+# decoded members by stored string
+_DECODED = {}
+
+
+def register(code):
+    """
+    Class decorator registering an enum class for compact storage.
+
+    Args:
+        code (str): The code stored for members of the class. It may not
+            contain ':'.
+
+    Returns:
+        decorator (callable): The class decorator.
+
+    Raises:
+        ValueError: If the code is invalid or taken, or a member of the
+            class has a value that is not an int.
+
+    """
+    def decorator(enum_class):
+        if ":" in code or ENUM_CLASSES.get(code, enum_class) is not enum_class:
+            raise ValueError("Cannot register {0} as '{1}'.".format(enum_class, code))
+        for member in enum_class:
+            if type(member.value) is not int:
+                raise ValueError("Cannot register {0}: the value of {1} is not an int.".format(
+                    enum_class, member))
+        ENUM_CLASSES[code] = enum_class
+        _CODES[enum_class] = code
+        return enum_class
+    return decorator
+
+
+def encode(member):
+    """
+    Encode an enum member.
+
+    Args:
+        member (Enum): A member of a registered enum class.
+
+    Returns:
+        string (str): The encoded member.
+
+    """
+    return "{0}:{1}".format(_CODES[type(member)], member.value)
+
+
+def decode(string):
+    """
+    Decode an enum member.
+
+    Args:
+        string (str): A string made by `encode`.
+
+    Returns:
+        member (Enum or None): The member, or `None` if the string is not
+            a known encoded member.
+
+    """
+    member = _DECODED.get(string)
+    if member is None:
+        code, _, value = string.partition(":")
+        enum_class = ENUM_CLASSES.get(code)
+        if enum_class is None:
+            return None
+        try:
+            member = enum_class(int(value))
+        except ValueError:
+            logger.log_err("Unknown enum value stored: '{0}'".format(string))
+            return None
+        _DECODED[string] = member
+    return member
+
+
+class EnumAttributeHandler:
+    """
+    Handler for an object's enum-valued Attributes.
+
+    """
+
+    __slots__ = ("obj",)
+
+    def __init__(self, obj):
+        """
+        Args:
+            obj (Object): The object this handler is attached to.
+
+        """
+        self.obj = obj
+
+    def get(self, key, default=None, category=None):
+        """
+        Get an enum Attribute.
+
+        Args:
+            key (str): The Attribute key.
+            default (Enum, optional): Returned if the Attribute does not
+                exist.
+            category (str, optional): The Attribute category.
+
+        Returns:
+            member (Enum): The stored member.
+
+        """
+        string = self.obj.writebehind.get(key, category=category, strattr=True)
+        if string:
+            member = decode(string)
+            return default if member is None else member
+
+        # written before the values were encoded
+        value = self.obj.writebehind.get(key, category=category)
+        if value is None:
+            return default
+        if type(value) in _CODES:
+            self.add(key, value, category=category)
+        return value
+
+    def add(self, key, member, category=None):
+        """
+        Store an enum Attribute.
+
+        Args:
+            key (str): The Attribute key.
+            member (Enum): A member of a registered enum class.
+            category (str, optional): The Attribute category.
+
+        """
+        self.obj.writebehind.add(key, encode(member), category=category, strattr=True)
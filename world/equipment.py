@@ -0,0 +1,284 @@
+"""
+Equipment
+
+The `EquipmentHandler` keeps an in-memory, fixed-slot view of what a
+Character is wearing on each body part and holding in each hand. It is
+made available on Characters as `character.equipment`.
+
+Every slot is stored as its own Attribute (category `equipment` for
+body parts, category `inventory` for hands), so changing one slot only
+rewrites that one row. Slot changes are saved through the Character's
+write-behind buffer (see `world.writebehind`). All slots are loaded in
+one go the first time the handler is used and afterwards all reads are
+served from memory.
+
+The rendered equipment sheet is memoized as well. It is thrown away when
+something is worn or removed, and re-rendered if the key of a worn item
+no longer matches the one it was rendered with (the item was renamed).
+
+Characters created before the handler existed kept everything in two
+pickled dicts, `db.equipment` and `db.inventory`. These are converted to
+the per-slot layout the first time such a Character is loaded.
+
+"""
+
+EQUIPMENT_CATEGORY = "equipment"
+INVENTORY_CATEGORY = "inventory"
+
+
+class EquipmentHandler:
+    """
+    Handler for a Character's worn and held items.
+
+    Body parts are given by the name used in the Character's
+    `equipable_body_parts`, hands are given as `Hand` enum members.
+
+    """
+
+    __slots__ = (
+        "obj",
+        "_parts",
+        "_part_index",
+        "_worn",
+        "_held",
+        "_loaded",
+        "_display",
+        "_display_data",
+        "_display_names",
+    )
+
+    def __init__(self, obj):
+        """
+        Args:
+            obj (Character): The Character this handler is attached to.
+
+        """
+        self.obj = obj
+        self._parts = tuple(obj.equipable_body_parts)
+        self._part_index = {part: index for index, part in enumerate(self._parts)}
+        self._worn = [None] * len(self._parts)
+        self._held = [None, None]
+        self._loaded = False
+        self._display = None
+        self._display_data = None
+        self._display_names = None
+
+    def _load(self):
+        """
+        Read all slots from the database in one pass, converting any
+        legacy `db.equipment`/`db.inventory` dicts found on the way.
+        Slot changes not yet written are saved first, so they are read
+        back.
+
+        """
+        self.obj.writebehind.flush()
+        attributes = self.obj.attributes
+        legacy_equipment = attributes.get("equipment")
+        legacy_inventory = attributes.get("inventory")
+        if legacy_equipment is not None or legacy_inventory is not None:
+            self._convert_legacy(legacy_equipment or {}, legacy_inventory or {})
+        else:
+            for attr in attributes.get(
+                category=EQUIPMENT_CATEGORY, return_obj=True, return_list=True
+            ):
+                index = self._part_index.get(attr.key)
+                if index is not None:
+                    self._worn[index] = attr.value
+            for attr in attributes.get(
+                category=INVENTORY_CATEGORY, return_obj=True, return_list=True
+            ):
+                if attr.key == "left":
+                    self._held[0] = attr.value
+                elif attr.key == "right":
+                    self._held[1] = attr.value
+        self._loaded = True
+
+    def _convert_legacy(self, legacy_equipment, legacy_inventory):
+        """
+        Move the contents of the old pickled dicts into per-slot
+        Attributes and delete the dicts.
+
+        """
+        for part, item in legacy_equipment.items():
+            index = self._part_index.get(part)
+            if index is not None:
+                self._worn[index] = item
+        for hand, item in legacy_inventory.items():
+            self._held[hand.value] = item
+
+        self._save_all()
+        self.obj.attributes.remove("equipment")
+        self.obj.attributes.remove("inventory")
+
+    def _save_all(self):
+        """
+        Write every slot to the database.
+
+        """
+        self.obj.attributes.batch_add(
+            *[
+                (part, self._worn[index], EQUIPMENT_CATEGORY)
+                for index, part in enumerate(self._parts)
+            ],
+            ("left", self._held[0], INVENTORY_CATEGORY),
+            ("right", self._held[1], INVENTORY_CATEGORY),
+        )
+
+    def initialize(self):
+        """
+        Make sure every slot exists in the database, keeping whatever is
+        already stored. Called when the Character is first created.
+
+        """
+        if not self._loaded:
+            self._load()
+        self._save_all()
+
+    def get_worn(self, part):
+        """
+        Get the item worn on a body part.
+
+        Args:
+            part (str): The body part.
+
+        Returns:
+            item (Object or None): The worn item, if any.
+
+        """
+        if not self._loaded:
+            self._load()
+        return self._worn[self._part_index[part]]
+
+    def set_worn(self, part, item):
+        """
+        Wear an item on a body part, or clear it by passing `None`.
+        Nothing is written if the slot already holds `item`.
+
+        Args:
+            part (str): The body part.
+            item (Object or None): The item to wear there.
+
+        """
+        if not self._loaded:
+            self._load()
+        index = self._part_index[part]
+        if self._worn[index] is item:
+            return
+        self._worn[index] = item
+        self._display = None
+        self.obj.writebehind.add(part, item, category=EQUIPMENT_CATEGORY)
+
+    def get_held(self, hand):
+        """
+        Get the item held in a hand.
+
+        Args:
+            hand (Hand): The hand to check.
+
+        Returns:
+            item (Object or None): The held item, if any.
+
+        """
+        if not self._loaded:
+            self._load()
+        return self._held[hand.value]
+
+    def set_held(self, hand, item):
+        """
+        Put an item in a hand, or empty it by passing `None`. Nothing is
+        written if the hand already holds `item`.
+
+        Args:
+            hand (Hand): The hand.
+            item (Object or None): The item to hold.
+
+        """
+        if not self._loaded:
+            self._load()
+        if self._held[hand.value] is item:
+            return
+        self._held[hand.value] = item
+        self.obj.writebehind.add(hand.name, item, category=INVENTORY_CATEGORY)
+
+    def is_holding(self, item):
+        """
+        Check if an item is held in either hand.
+
+        Args:
+            item (Object): The item to look for.
+
+        Returns:
+            holding (bool): If the item is held.
+
+        """
+        if not self._loaded:
+            self._load()
+        return item is not None and (self._held[0] is item or self._held[1] is item)
+
+    def all_worn(self):
+        """
+        Get all body parts together with what is worn there.
+
+        Returns:
+            worn (list): A list of `(part, item)` tuples in body part order,
+                where `item` is `None` for empty slots.
+
+        """
+        if not self._loaded:
+            self._load()
+        return list(zip(self._parts, self._worn))
+
+    def _render(self):
+        """
+        Make sure the memoized equipment sheet is current.
+
+        """
+        if not self._loaded:
+            self._load()
+        names = tuple(item.key if item is not None else None for item in self._worn)
+        if self._display is not None and names == self._display_names:
+            return
+
+        self._display_data = tuple(
+            (part.replace("_", " ").capitalize(), name or "Nothing")
+            for part, name in zip(self._parts, names)
+        )
+        self._display = "".join(
+            "{0}: {1}\n".format(part, name) for part, name in self._display_data
+        )
+        self._display_names = names
+
+    def get_display(self):
+        """
+        Get the equipment sheet as shown by the `equipment` command.
+
+        Returns:
+            display (str): One line per body part.
+
+        """
+        self._render()
+        return self._display
+
+    def get_display_data(self):
+        """
+        Get the equipment sheet in structured form, for clients that
+        render it themselves.
+
+        Returns:
+            data (list): A list of `[part, item_name]` pairs in body part
+                order, using the same labels as `get_display`.
+
+        """
+        self._render()
+        return [list(row) for row in self._display_data]
+
+    def reset(self):
+        """
+        Forget the in-memory view so it is re-read from the database on
+        next access.
+
+        """
+        self._worn = [None] * len(self._parts)
+        self._held = [None, None]
+        self._loaded = False
+        self._display = None
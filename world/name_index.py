@@ -0,0 +1,371 @@
+"""
+Name index
+
+The `NameIndexHandler` keeps the keys and aliases of everything inside
+an object in memory, so that finding the objects matching a search
+string does not mean going through every object in a room or an
+inventory. It is made available on all objects as `obj.name_index`,
+and is used by `CustomObject.search`.
+
+Names are indexed in lower case, both whole and split into words, with
+every prefix of every word. This is enough to answer the two kinds of
+lookups Evennia's object search makes: an exact match of the search
+string against a key or alias, and a partial match where each word of
+the search string begins a word of the name, in order.
+
+For searches with typos, the character n-grams of every word of every
+name are indexed as well. `fuzzy` scores names by how similar their
+words are to the search words, see `similarity`. Only names sharing
+enough n-grams with a search word to reach the threshold can match, so
+only the postings of the rarest n-grams of each search word are looked
+at to find them, not those of common n-grams shared by most names.
+
+The index is built from the object's contents the first time it is used
+and is then kept current by the receive/leave hooks, by `at_rename` and
+when a new object is created inside the object. Lookups check that each
+match is still inside the object and still has the indexed name, so an
+object that moved or was renamed without any of these hooks firing is
+never returned by mistake. Such an object may however be missed, and
+`CustomObject.search` falls back to the database when nothing is found.
+Use `reset()` after changing many names or locations directly.
+
+"""
+import math
+
+from django.conf import settings
+
+_SEARCH_FUZZY_THRESHOLD = settings.SEARCH_FUZZY_THRESHOLD
+
+# length of the character n-grams indexed for fuzzy matching. Bigrams
+# still have a good overlap between short words and their typos, such
+# as "hlemet" and "helmet".
+NGRAM_SIZE = 2
+
+
+def _prefixes(name):
+    """
+    Get every prefix of every word in a name.
+
+    Args:
+        name (str): A lower case name.
+
+    Returns:
+        prefixes (set): The prefixes.
+
+    """
+    return {word[:end] for word in name.split() for end in range(1, len(word) + 1)}
+
+
+def _ngrams(word):
+    """
+    Get the character n-grams of a word, padded with a space on both
+    sides so the first and last letters weigh as much as the others.
+
+    Args:
+        word (str): A lower case word.
+
+    Returns:
+        ngrams (frozenset): The n-grams.
+
+    """
+    word = " {0} ".format(word)
+    return frozenset(word[index:index + NGRAM_SIZE]
+                     for index in range(len(word) - NGRAM_SIZE + 1))
+
+
+def similarity(words, name):
+    """
+    Score how similar a name is to a list of search words. Each search
+    word is compared with the most similar word of the name, by the Dice
+    coefficient of their n-grams, and the score is the mean of these.
+
+    Args:
+        words (list): The lower case search words.
+        name (str): A lower case name.
+
+    Returns:
+        score (float): From 0 (nothing in common) to 1 (all words equal).
+
+    """
+    name_ngrams = [_ngrams(name_word) for name_word in name.split()]
+    if not words or not name_ngrams:
+        return 0.0
+    total = 0.0
+    for word in words:
+        ngrams = _ngrams(word)
+        total += max(2.0 * len(ngrams & other) / (len(ngrams) + len(other))
+                     for other in name_ngrams)
+    return total / len(words)
+
+
+def _partial_match(name, words):
+    """
+    Check if each search word begins a word of the name, in order. This
+    is the test made by `evennia.utils.utils.string_partial_matching`.
+
+    Args:
+        name (str): A lower case name.
+        words (list): The lower case search words.
+
+    Returns:
+        match (bool): If the name matches.
+
+    """
+    name_words = name.split()
+    index = 0
+    for word in words:
+        for name_index in range(index, len(name_words)):
+            if name_words[name_index].startswith(word):
+                index = name_index + 1
+                break
+        else:
+            return False
+    return True
+
+
+class NameIndexHandler:
+    """
+    Handler for the names of an object's contents.
+
+    """
+
+    __slots__ = (
+        "obj", "_exact", "_key_prefixes", "_alias_prefixes", "_ngram_postings", "_names", "_loaded")
+
+    def __init__(self, obj):
+        """
+        Args:
+            obj (Object): The object this handler is attached to.
+
+        """
+        self.obj = obj
+        self._exact = {}
+        self._key_prefixes = {}
+        self._alias_prefixes = {}
+        self._ngram_postings = {}
+        self._names = {}
+        self._loaded = False
+
+    def _load(self):
+        """
+        Build the index from the object's current contents.
+
+        """
+        self._exact = {}
+        self._key_prefixes = {}
+        self._alias_prefixes = {}
+        self._ngram_postings = {}
+        self._names = {}
+        self._loaded = True
+        for obj in self.obj.contents:
+            self._add(obj)
+
+    @staticmethod
+    def _get_names(obj):
+        return obj.key.lower(), tuple(alias.lower() for alias in obj.aliases.all())
+
+    @staticmethod
+    def _get_ngrams(names):
+        key, aliases = names
+        return set().union(*(_ngrams(word) for name in (key,) + aliases for word in name.split()))
+
+    def _add(self, obj):
+        key, aliases = names = self._get_names(obj)
+        self._names[obj] = names
+        for name in (key,) + aliases:
+            self._exact.setdefault(name, {})[obj] = None
+        for prefix in _prefixes(key):
+            self._key_prefixes.setdefault(prefix, {})[obj] = None
+        for prefix in set().union(*map(_prefixes, aliases)):
+            self._alias_prefixes.setdefault(prefix, {})[obj] = None
+        for ngram in self._get_ngrams(names):
+            self._ngram_postings.setdefault(ngram, {})[obj] = None
+
+    def _discard(self, table, name, obj):
+        objs = table.get(name)
+        if objs is not None:
+            objs.pop(obj, None)
+            if not objs:
+                del table[name]
+
+    def _valid(self, obj):
+        """
+        Check that an indexed object is still inside the object under the
+        names it was indexed with. Objects that are not are re-indexed.
+
+        """
+        if obj.location != self.obj:
+            self.remove(obj)
+            return False
+        if self._names.get(obj) != self._get_names(obj):
+            self.remove(obj)
+            self._add(obj)
+            return False
+        return True
+
+    def add(self, obj):
+        """
+        Add an object that has arrived inside the object.
+
+        Args:
+            obj (Object): The new object.
+
+        """
+        if not self._loaded:
+            return
+        self.remove(obj)
+        self._add(obj)
+
+    def remove(self, obj):
+        """
+        Remove an object that has left the object.
+
+        Args:
+            obj (Object): The object that left.
+
+        """
+        names = self._names.pop(obj, None)
+        if names is None:
+            return
+        key, aliases = names
+        for name in (key,) + aliases:
+            self._discard(self._exact, name, obj)
+        for prefix in _prefixes(key):
+            self._discard(self._key_prefixes, prefix, obj)
+        for prefix in set().union(*map(_prefixes, aliases)):
+            self._discard(self._alias_prefixes, prefix, obj)
+        for ngram in self._get_ngrams(names):
+            self._discard(self._ngram_postings, ngram, obj)
+
+    def update(self, obj):
+        """
+        Re-index an object whose key or aliases have changed. Removes the
+        object if it is no longer inside the object.
+
+        Args:
+            obj (Object): The changed object.
+
+        """
+        if obj.location == self.obj:
+            self.add(obj)
+        else:
+            self.remove(obj)
+
+    def exact(self, searchdata):
+        """
+        Find the objects with a key or alias equal to the search string,
+        ignoring case.
+
+        Args:
+            searchdata (str): The search string.
+
+        Returns:
+            matches (list): The matching objects.
+
+        """
+        if not self._loaded:
+            self._load()
+        name = searchdata.strip().lower()
+        matches = list(self._exact.get(name, ()))
+        valid = [obj for obj in matches if self._valid(obj)]
+        if len(valid) < len(matches):
+            # re-indexed objects may match under their new names
+            valid = [obj for obj in list(self._exact.get(name, ())) if self._valid(obj)]
+        return valid
+
+    def _partial(self, table, words, aliases):
+        candidates = None
+        for word in words:
+            objs = table.get(word, {})
+            candidates = (set(objs) if candidates is None
+                          else candidates.intersection(objs))
+            if not candidates:
+                return []
+        matches = []
+        for obj in candidates:
+            if not self._valid(obj):
+                continue
+            key, obj_aliases = self._names[obj]
+            names = obj_aliases if aliases else (key,)
+            if any(_partial_match(name, words) for name in names):
+                matches.append(obj)
+        return matches
+
+    def partial(self, searchdata, aliases=False):
+        """
+        Find the objects where each word of the search string begins a
+        word of their key, in order.
+
+        Args:
+            searchdata (str): The search string.
+            aliases (bool, optional): Match against the aliases instead
+                of the keys.
+
+        Returns:
+            matches (list): The matching objects.
+
+        """
+        if not self._loaded:
+            self._load()
+        words = searchdata.lower().split()
+        if not words:
+            return []
+        table = self._alias_prefixes if aliases else self._key_prefixes
+        return self._partial(table, words, aliases)
+
+    def fuzzy(self, searchdata, threshold=None):
+        """
+        Find the objects with a key or alias similar to the search string.
+
+        Args:
+            searchdata (str): The search string.
+            threshold (float, optional): The lowest `similarity` score a
+                name can have to match. Defaults to
+                `settings.SEARCH_FUZZY_THRESHOLD`.
+
+        Returns:
+            matches (list): (score, object) tuples, with the score of the
+                most similar name of each matching object.
+
+        """
+        if not self._loaded:
+            self._load()
+        if threshold is None:
+            threshold = _SEARCH_FUZZY_THRESHOLD
+        words = searchdata.lower().split()
+        if not words:
+            return []
+
+        # A name scores at least the threshold only if one of its words
+        # shares at least `needed` of the n-grams of some search word (a
+        # bound from the Dice coefficient). Objects sharing that many
+        # n-grams share at least one of the rarest len - needed + 1 ones.
+        postings = self._ngram_postings
+        candidates = set()
+        for word in words:
+            ngrams = sorted(_ngrams(word), key=lambda ngram: len(postings.get(ngram, ())))
+            needed = max(1, math.ceil(threshold * len(ngrams) / (2 - threshold) - 1e-9))
+            for ngram in ngrams[:len(ngrams) - needed + 1]:
+                candidates.update(postings.get(ngram, ()))
+
+        matches = []
+        for obj in candidates:
+            if not self._valid(obj):
+                continue
+            key, aliases = self._names[obj]
+            score = max(similarity(words, name) for name in (key,) + aliases)
+            if score >= threshold:
+                matches.append((score, obj))
+        return matches
+
+    def reset(self):
+        """
+        Rebuild the index from the object's contents on next access.
+
+        """
+        self._exact = {}
+        self._key_prefixes = {}
+        self._alias_prefixes = {}
+        self._ngram_postings = {}
+        self._names = {}
+        self._loaded = False
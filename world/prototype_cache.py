@@ -0,0 +1,220 @@
+"""
+Prototype cache
+
+Prototypes inherit from each other through `prototype_parent`, often
+over several levels and from more than one parent (see
+`world/prototypes.py`), and Evennia merges the whole chain again every
+time a prototype is spawned. This module keeps every prototype fully
+merged in memory instead. `get` hands out a copy of the merged dict,
+without `prototype_parent`, so spawning it has nothing left to merge,
+and `spawn` is Evennia's `spawn` using those merged prototypes. Since
+its parents are already merged, merging a prototype only takes one
+level, done the way Evennia does it: later parents and then the
+prototype itself override earlier ones, with `attrs` and `tags`
+overridden per key and category.
+
+All prototypes are read and merged when the server starts, by `build`.
+Which prototypes inherit from which is remembered, so that when a
+prototype stored in the database is changed or deleted only it and the
+prototypes inheriting from it, directly or not, are merged again, the
+next time they are asked for. Database prototypes are watched through
+the saves and deletes of their `DbPrototype` scripts, which
+`save_prototype` and `delete_prototype` always make. A prototype saved
+under a new key is no longer found under the old one. Module
+prototypes only change with a reload, which builds the cache anew.
+
+"""
+import copy
+
+from django.db.models.signals import post_delete, post_save
+
+from evennia.prototypes import prototypes as protlib
+from evennia.prototypes import spawner
+from evennia.utils.utils import make_iter
+
+# prototypes as stored, by lower case prototype key
+_PROTOTYPES = {}
+# merged prototypes by lower case prototype key
+_RESOLVED = {}
+# keys of the prototypes inheriting directly from a prototype, by key
+_CHILDREN = {}
+# keys of database prototypes by the id of their DbPrototype script
+_SCRIPT_KEYS = {}
+# ids of DbPrototype scripts saved since they were last read
+_STALE = set()
+
+
+def _entry_key(entry, index):
+    entry = tuple(make_iter(entry))
+    return entry[0], entry[index] if len(entry) > index else None
+
+
+def _merge(prototype):
+    """
+    Merge a prototype with its parents, which are merged first.
+
+    """
+    merged = {}
+    attrs = {}
+    tags = {}
+    parents = prototype.get("prototype_parent") or ()
+    for parent in [parents] if isinstance(parents, dict) else make_iter(parents):
+        if isinstance(parent, dict):
+            parent = _merge(parent)
+        else:
+            parent = _resolve(parent.lower()) or {}
+        merged.update(parent)
+        attrs.update((_entry_key(attr, 2), attr) for attr in parent.get("attrs", ()))
+        tags.update((_entry_key(tag, 1), tag) for tag in parent.get("tags", ()))
+
+    merged.update(prototype)
+    attrs.update((_entry_key(attr, 2), attr) for attr in prototype.get("attrs", ()))
+    tags.update((_entry_key(tag, 1), tag) for tag in prototype.get("tags", ()))
+    merged["attrs"] = list(attrs.values())
+    merged["tags"] = list(tags.values())
+    merged.pop("prototype_parent", None)
+    return merged
+
+
+def _resolve(key):
+    """
+    Get a merged prototype, merging it if needed, and remember its
+    parents.
+
+    """
+    resolved = _RESOLVED.get(key)
+    if resolved is None:
+        prototype = _PROTOTYPES.get(key)
+        if prototype is None:
+            return None
+        for parent in make_iter(prototype.get("prototype_parent") or ()):
+            if isinstance(parent, str):
+                _CHILDREN.setdefault(parent.lower(), set()).add(key)
+        resolved = _RESOLVED[key] = _merge(prototype)
+    return resolved
+
+
+def _forget_script(script_id):
+    key = _SCRIPT_KEYS.pop(script_id, None)
+    if key is not None:
+        _PROTOTYPES.pop(key, None)
+        invalidate(key)
+
+
+def _refresh():
+    """
+    Read the database prototypes saved since they were last read.
+
+    """
+    stale = list(_STALE)
+    _STALE.clear()
+    for script in protlib.DbPrototype.objects.filter(id__in=stale):
+        _forget_script(script.id)
+        prototype = script.prototype
+        key = (prototype.get("prototype_key") or "").lower()
+        if key:
+            _SCRIPT_KEYS[script.id] = key
+            _PROTOTYPES[key] = prototype
+            invalidate(key)
+
+
+def _prototype_saved(sender, instance, **kwargs):
+    # the prototype Attribute is often written after the script is
+    # saved, so it is only read the next time a prototype is asked for
+    _STALE.add(instance.id)
+
+
+def _prototype_deleted(sender, instance, **kwargs):
+    _STALE.discard(instance.id)
+    _forget_script(instance.id)
+
+
+def build():
+    """
+    Read and merge all prototypes, and start watching database
+    prototypes for changes. Called when the server starts.
+
+    """
+    _PROTOTYPES.clear()
+    _RESOLVED.clear()
+    _CHILDREN.clear()
+    _SCRIPT_KEYS.clear()
+    _STALE.clear()
+    for prototype in protlib.search_prototype():
+        _PROTOTYPES[prototype["prototype_key"].lower()] = prototype
+    for script in protlib.DbPrototype.objects.all():
+        key = (script.prototype.get("prototype_key") or "").lower()
+        if key:
+            _SCRIPT_KEYS[script.id] = key
+    for key in _PROTOTYPES:
+        _resolve(key)
+
+    post_save.connect(_prototype_saved, sender=protlib.DbPrototype,
+                      dispatch_uid="prototype_cache_save")
+    post_delete.connect(_prototype_deleted, sender=protlib.DbPrototype,
+                        dispatch_uid="prototype_cache_delete")
+
+
+def get(key):
+    """
+    Get a prototype merged with all of its parents.
+
+    Args:
+        key (str): The prototype key.
+
+    Returns:
+        prototype (dict or None): A copy of the merged prototype, or
+            `None` if there is no such prototype.
+
+    """
+    if _STALE:
+        _refresh()
+    resolved = _resolve(key.lower())
+    return None if resolved is None else copy.deepcopy(resolved)
+
+
+def spawn(*prototypes, **kwargs):
+    """
+    Spawn objects like `evennia.prototypes.spawner.spawn`, taking
+    prototypes given by key, and the parents of prototypes given as
+    dicts, merged from the cache.
+
+    Args:
+        *prototypes (str or dict): Prototype keys or prototypes.
+        **kwargs: Passed on to `spawner.spawn`.
+
+    Returns:
+        objects (list): The spawned objects, or what `spawner.spawn`
+            returns for the given options.
+
+    """
+    if _STALE:
+        _refresh()
+    merged = []
+    for prototype in prototypes:
+        if isinstance(prototype, str):
+            # unknown keys are left for spawner.spawn to report
+            prototype = get(prototype) or prototype
+        elif prototype.get("prototype_parent"):
+            prototype = copy.deepcopy(_merge(prototype))
+        merged.append(prototype)
+    return spawner.spawn(*merged, **kwargs)
+
+
+def invalidate(key):
+    """
+    Forget the merged form of a prototype and of all prototypes that
+    inherit from it.
+
+    Args:
+        key (str): The prototype key.
+
+    """
+    pending = [key.lower()]
+    seen = set()
+    while pending:
+        key = pending.pop()
+        if key not in seen:
+            seen.add(key)
+            _RESOLVED.pop(key, None)
+            pending.extend(_CHILDREN.get(key, ()))
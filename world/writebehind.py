@@ -0,0 +1,220 @@
+"""
+Write-behind Attributes
+
+The `WriteBehindHandler` buffers Attribute writes in memory and saves
+them later, all pending writes of all objects in one transaction. This
+is meant for state that changes often as part of play, such as a
+Character's position, what is worn and held, or whether a door is open,
+where saving every change right away would make each command wait for
+several database writes. It is made available on all objects as
+`obj.writebehind`.
+
+Values written through the handler must also be read through it, since
+the Attribute itself is only updated on the next flush. Only the latest
+value of each Attribute is kept, so changing the same Attribute many
+times between flushes costs a single write.
+
+Pending writes are flushed `settings.WRITE_BEHIND_INTERVAL` seconds after
+the first of them was made, when the server stops or reloads (see
+`server/conf/at_server_startstop.py`), and when an object with pending
+writes is dropped from the idmapper cache (see
+`CustomObject.at_idmapper_flush`). If the server process dies without
+stopping, the changes of the last interval are lost. Setting the
+interval to 0 writes every change right away.
+
+Objects are only referenced weakly while their writes are pending, so a
+deleted object is not kept in memory by them. Existing Attributes are
+saved with one UPDATE per object and storage type. Each object is saved
+in its own savepoint: if its writes fail, they are logged and dropped,
+and the writes of the other objects are saved.
+
+"""
+import weakref
+
+from django.conf import settings
+from django.db import transaction
+
+from evennia.typeclasses.attributes import Attribute
+from evennia.utils import logger
+from evennia.utils.dbserialize import to_pickle
+from evennia.utils.utils import delay
+
+_WRITE_BEHIND_INTERVAL = settings.WRITE_BEHIND_INTERVAL
+
+# (weak reference to the object, {(key, category): (value, strattr)})
+# by object id
+_PENDING = {}
+_SCHEDULED = [False]
+
+
+def flush():
+    """
+    Save all pending writes in one transaction. Writes to objects that
+    were deleted in the meantime are dropped, and so are writes that
+    fail to save.
+
+    Returns:
+        saved (int): The number of Attributes saved.
+
+    """
+    _SCHEDULED[0] = False
+    if not _PENDING:
+        return 0
+
+    pending = list(_PENDING.values())
+    _PENDING.clear()
+    saved = 0
+    try:
+        with transaction.atomic():
+            for ref, attrs in pending:
+                obj = ref()
+                if obj is None or not obj.pk:
+                    continue
+                try:
+                    with transaction.atomic():
+                        _save(obj, attrs)
+                except Exception:
+                    logger.log_trace("Write-behind could not save {0}, dropping {1}.".format(
+                        obj.dbref, ", ".join(key for key, _ in attrs)))
+                    continue
+                saved += len(attrs)
+    except Exception:
+        logger.log_trace("Write-behind flush failed, retrying later.")
+        # keep newer writes made since this flush started
+        for ref, attrs in pending:
+            obj = ref()
+            if obj is None:
+                continue
+            entry = _PENDING.setdefault(obj.id, (ref, {}))
+            for name, value in attrs.items():
+                entry[1].setdefault(name, value)
+        _schedule()
+        return 0
+    return saved
+
+
+def _save(obj, attrs):
+    """
+    Save the pending writes of one object. Attributes that exist are
+    updated with one query per storage type, without touching their
+    locks. New ones are added through the object's AttributeHandler.
+    Writing a string value clears any pickled value left from before
+    the Attribute was stored as a string.
+
+    """
+    handler = obj.attributes
+    changed = {False: [], True: []}
+    for (key, category), (value, strattr) in attrs.items():
+        attr = handler.get(key, category=category, return_obj=True)
+        if attr is None:
+            handler.add(key, value, category=category, strattr=strattr)
+        elif strattr:
+            attr.db_strvalue = value
+            attr.db_value = None
+            changed[True].append(attr)
+        else:
+            attr.db_value = to_pickle(value)
+            changed[False].append(attr)
+
+    if changed[False]:
+        Attribute.objects.bulk_update(changed[False], ["db_value"])
+    if changed[True]:
+        Attribute.objects.bulk_update(changed[True], ["db_strvalue", "db_value"])
+
+
+def _schedule():
+    if not _SCHEDULED[0]:
+        _SCHEDULED[0] = True
+        delay(_WRITE_BEHIND_INTERVAL, flush)
+
+
+class WriteBehindHandler:
+    """
+    Handler for an object's buffered Attribute writes.
+
+    """
+
+    __slots__ = ("obj",)
+
+    def __init__(self, obj):
+        """
+        Args:
+            obj (Object): The object this handler is attached to.
+
+        """
+        self.obj = obj
+
+    def get(self, key, default=None, category=None, strattr=False):
+        """
+        Get an Attribute value, including writes not yet saved.
+
+        Args:
+            key (str): The Attribute key.
+            default (any, optional): Returned if the Attribute does not
+                exist.
+            category (str, optional): The Attribute category.
+            strattr (bool, optional): Get the string value of the
+                Attribute, which is stored without pickling.
+
+        Returns:
+            value (any): The value.
+
+        """
+        entry = _PENDING.get(self.obj.id)
+        if entry is not None:
+            pending = entry[1].get((key, category))
+            if pending is not None and pending[1] is strattr:
+                return pending[0]
+        return self.obj.attributes.get(key, default=default, category=category,
+                                       strattr=strattr)
+
+    def add(self, key, value, category=None, strattr=False):
+        """
+        Set an Attribute, saving it with the next flush.
+
+        Args:
+            key (str): The Attribute key.
+            value (any): The value.
+            category (str, optional): The Attribute category.
+            strattr (bool, optional): Store `value`, a string, as the
+                string value of the Attribute.
+
+        """
+        if _WRITE_BEHIND_INTERVAL <= 0:
+            self.obj.attributes.add(key, value, category=category, strattr=strattr)
+            return
+
+        obj = self.obj
+        entry = _PENDING.get(obj.id)
+        if entry is None or entry[0]() is not obj:
+            # keep writes made through an earlier instance of the object
+            entry = _PENDING[obj.id] = (weakref.ref(obj), entry[1] if entry else {})
+        entry[1][(key, category)] = (value, strattr)
+        _schedule()
+
+    def discard(self, key, category=None):
+        """
+        Drop a pending write, for when the Attribute is written directly.
+
+        Args:
+            key (str): The Attribute key.
+            category (str, optional): The Attribute category.
+
+        """
+        entry = _PENDING.get(self.obj.id)
+        if entry is not None:
+            entry[1].pop((key, category), None)
+
+    def flush(self):
+        """
+        Save the pending writes of this object right away, such as before
+        reading its Attributes directly.
+
+        """
+        entry = _PENDING.pop(self.obj.id, None)
+        if entry is not None and self.obj.pk:
+            _save(self.obj, entry[1])
+
+    def __len__(self):
+        entry = _PENDING.get(self.obj.id)
+        return len(entry[1]) if entry is not None else 0